@@ -8,9 +8,10 @@ from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from collections import deque, defaultdict
 import statistics
+import numpy as np
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class QuantumMetrics:
     """Quantum system performance metrics"""
     timestamp: datetime
@@ -27,7 +28,7 @@ class QuantumMetrics:
     success_rate: float
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PerformanceBenchmark:
     """Performance benchmark result"""
     benchmark_id: str
@@ -47,9 +48,14 @@ class QuantumPerformanceMonitor:
     def __init__(self, history_size: int = 10000):
         """Initialize performance monitor"""
         self.metrics_history: deque = deque(maxlen=history_size)
-        self.benchmarks: Dict[str, PerformanceBenchmark] = {}
+        # Columnar ring of the trend-tracked fields (latency, fidelity, error rate)
+        self._trend_buf = np.empty((3, history_size), dtype=np.float64)
+        self._count = 0
+        # Benchmarks are produced in end_time order, so the deque stays sorted
+        self.benchmarks: deque = deque(maxlen=1000)
         self.alerts: List[Dict] = []
         self.resource_usage: Dict = {}
+        self._rng = np.random.default_rng()
         
         # Performance thresholds
         self.latency_threshold_ms = 100.0
@@ -91,6 +97,9 @@ class QuantumPerformanceMonitor:
         )
 
         self.metrics_history.append(metrics)
+        slot = self._count % self._trend_buf.shape[1]
+        self._trend_buf[:, slot] = (execution_time_ms, fidelity, error_rate)
+        self._count += 1
 
         # Check thresholds and generate alerts
         self._check_thresholds(metrics)
@@ -134,9 +143,8 @@ class QuantumPerformanceMonitor:
         start_time = datetime.now()
 
         # Simulate execution
-        import random
-        execution_times = [random.gauss(50, 10) for _ in range(num_iterations)]
-        avg_latency = statistics.mean(execution_times)
+        execution_times = self._rng.normal(50.0, 10.0, num_iterations)
+        avg_latency = float(execution_times.mean())
 
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds() * 1000
@@ -155,13 +163,13 @@ class QuantumPerformanceMonitor:
             details={
                 "operations": len(circuit_operations),
                 "iterations": num_iterations,
-                "min_latency_ms": min(execution_times),
-                "max_latency_ms": max(execution_times),
-                "std_dev_ms": statistics.stdev(execution_times) if len(execution_times) > 1 else 0
+                "min_latency_ms": float(execution_times.min()),
+                "max_latency_ms": float(execution_times.max()),
+                "std_dev_ms": float(execution_times.std(ddof=1)) if num_iterations > 1 else 0
             }
         )
 
-        self.benchmarks[benchmark_id] = benchmark
+        self.benchmarks.append(benchmark)
         return benchmark
 
     def benchmark_throughput(
@@ -199,7 +207,7 @@ class QuantumPerformanceMonitor:
             }
         )
 
-        self.benchmarks[benchmark_id] = benchmark
+        self.benchmarks.append(benchmark)
         return benchmark
 
     def benchmark_fidelity(
@@ -213,9 +221,8 @@ class QuantumPerformanceMonitor:
         start_time = datetime.now()
 
         # Simulate fidelity measurements
-        import random
-        fidelities = [random.gauss(0.99, 0.01) for _ in range(num_circuits)]
-        avg_fidelity = statistics.mean(max(0, min(1, f)) for f in fidelities)
+        fidelities = np.clip(self._rng.normal(0.99, 0.01, num_circuits), 0.0, 1.0)
+        avg_fidelity = float(fidelities.mean())
 
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds() * 1000
@@ -234,13 +241,13 @@ class QuantumPerformanceMonitor:
             details={
                 "circuits_tested": num_circuits,
                 "circuit_depth": circuit_depth,
-                "min_fidelity": min(max(0, f) for f in fidelities),
-                "max_fidelity": min(1, max(fidelities)),
-                "std_dev": statistics.stdev(max(0, min(1, f)) for f in fidelities) if len(fidelities) > 1 else 0
+                "min_fidelity": float(fidelities.min()),
+                "max_fidelity": float(fidelities.max()),
+                "std_dev": float(fidelities.std(ddof=1)) if num_circuits > 1 else 0
             }
         )
 
-        self.benchmarks[benchmark_id] = benchmark
+        self.benchmarks.append(benchmark)
         return benchmark
 
     def monitor_resource_usage(
@@ -274,49 +281,42 @@ class QuantumPerformanceMonitor:
 
         issues = []
 
-        if len(self.metrics_history) < metrics_window:
+        size = self._trend_buf.shape[1]
+        if min(self._count, size) < metrics_window or metrics_window <= 10:
             return issues
 
-        recent = list(self.metrics_history)[-metrics_window:]
+        # Chronological window over the ring; rows are latency, fidelity, error rate
+        idx = np.arange(self._count - metrics_window, self._count) % size
+        window = self._trend_buf[:, idx]
+        earlier_latency, earlier_fidelity, earlier_error = window[:, :10].mean(axis=1)
+        recent_latency, recent_fidelity, recent_error = window[:, -10:].mean(axis=1)
 
         # Check for increasing latency trend
-        latencies = [m.execution_time_ms for m in recent]
-        if len(latencies) > 10:
-            recent_latency = statistics.mean(latencies[-10:])
-            earlier_latency = statistics.mean(latencies[:10])
-            if recent_latency > earlier_latency * 1.2:  # 20% increase
-                issues.append({
-                    "issue": "latency_degradation",
-                    "severity": "high",
-                    "trend": f"Latency increased {((recent_latency/earlier_latency - 1) * 100):.1f}%",
-                    "action": "Investigate system load and quantum processor performance"
-                })
+        if recent_latency > earlier_latency * 1.2:  # 20% increase
+            issues.append({
+                "issue": "latency_degradation",
+                "severity": "high",
+                "trend": f"Latency increased {((recent_latency/earlier_latency - 1) * 100):.1f}%",
+                "action": "Investigate system load and quantum processor performance"
+            })
 
         # Check for decreasing fidelity trend
-        fidelities = [m.fidelity for m in recent]
-        if len(fidelities) > 10:
-            recent_fidelity = statistics.mean(fidelities[-10:])
-            earlier_fidelity = statistics.mean(fidelities[:10])
-            if recent_fidelity < earlier_fidelity * 0.95:  # 5% decrease
-                issues.append({
-                    "issue": "fidelity_degradation",
-                    "severity": "high",
-                    "trend": f"Fidelity decreased from {earlier_fidelity:.4f} to {recent_fidelity:.4f}",
-                    "action": "Recalibrate quantum gates and check for environmental noise"
-                })
+        if recent_fidelity < earlier_fidelity * 0.95:  # 5% decrease
+            issues.append({
+                "issue": "fidelity_degradation",
+                "severity": "high",
+                "trend": f"Fidelity decreased from {earlier_fidelity:.4f} to {recent_fidelity:.4f}",
+                "action": "Recalibrate quantum gates and check for environmental noise"
+            })
 
         # Check for increasing error rate trend
-        error_rates = [m.error_rate for m in recent]
-        if len(error_rates) > 10:
-            recent_error = statistics.mean(error_rates[-10:])
-            earlier_error = statistics.mean(error_rates[:10])
-            if recent_error > earlier_error * 1.5:  # 50% increase
-                issues.append({
-                    "issue": "error_rate_increase",
-                    "severity": "critical",
-                    "trend": f"Error rate increased from {earlier_error*100:.2f}% to {recent_error*100:.2f}%",
-                    "action": "URGENT: Check for qubit coherence issues and environmental interference"
-                })
+        if recent_error > earlier_error * 1.5:  # 50% increase
+            issues.append({
+                "issue": "error_rate_increase",
+                "severity": "critical",
+                "trend": f"Error rate increased from {earlier_error*100:.2f}% to {recent_error*100:.2f}%",
+                "action": "URGENT: Check for qubit coherence issues and environmental interference"
+            })
 
         return issues
 
@@ -327,12 +327,12 @@ class QuantumPerformanceMonitor:
         average_5min = self.get_average_metrics(5)
         degradation_issues = self.detect_performance_degradation()
 
-        recent_benchmarks = sorted(
-            [b for b in self.benchmarks.values() 
-             if b.end_time > datetime.now() - timedelta(hours=1)],
-            key=lambda x: x.end_time,
-            reverse=True
-        )[:10]
+        cutoff = datetime.now() - timedelta(hours=1)
+        recent_benchmarks = []
+        for b in reversed(self.benchmarks):
+            if b.end_time <= cutoff or len(recent_benchmarks) == 10:
+                break
+            recent_benchmarks.append(b)
 
         return {
             "report_type": "quantum_performance_monitor",
@@ -5,7 +5,9 @@ Extends pattern detection for quantum computing scenarios
 import json
 from typing import Dict, Any, List, Tuple
 from dataclasses import dataclass
+from collections import deque
 import time
+import numpy as np
 
 
 @dataclass
@@ -32,8 +34,19 @@ class QuantumThreatDetector:
         """
         self.config = config
         self.quantum_operation_history = []
-        self.circuit_patterns = {}
-        self.oracle_query_log = {}
+        # Per-IP state is keyed by small integer IDs interned at ingress
+        self._ip_ids: Dict[str, int] = {}
+        self._next_id = 0
+        self.circuit_patterns: Dict[int, list] = {}
+        self.oracle_query_log: Dict[int, deque] = {}
+    
+    def _iid(self, ip: str) -> int:
+        """Intern an IP address to a stable integer ID"""
+        iid = self._ip_ids.get(ip)
+        if iid is None:
+            iid = self._ip_ids[ip] = self._next_id
+            self._next_id += 1
+        return iid
         
     def analyze_quantum_request(self, request: Dict[str, Any]) -> QuantumThreatAssessment:
         """
@@ -124,11 +137,12 @@ class QuantumThreatDetector:
         parameters = request.get("parameters", {})
         
         # Track circuit patterns
-        ip = request.get("ip", "unknown")
-        if ip not in self.circuit_patterns:
-            self.circuit_patterns[ip] = []
+        iid = self._iid(request.get("ip", "unknown"))
+        patterns = self.circuit_patterns.get(iid)
+        if patterns is None:
+            patterns = self.circuit_patterns[iid] = []
         
-        self.circuit_patterns[ip].append({
+        patterns.append({
             "depth": circuit_depth,
             "gates": gate_count,
             "timestamp": time.time()
@@ -136,16 +150,16 @@ class QuantumThreatDetector:
         
         # Keep only recent history
         cutoff_time = time.time() - 3600  # Last hour
-        self.circuit_patterns[ip] = [p for p in self.circuit_patterns[ip] 
-                                     if p["timestamp"] > cutoff_time]
+        patterns = self.circuit_patterns[iid] = [p for p in patterns
+                                                 if p["timestamp"] > cutoff_time]
         
         is_detected = False
         risk_score = 0.0
         evidence = {}
         
         # Check for progressive depth increase
-        if len(self.circuit_patterns[ip]) > 5:
-            depths = [p["depth"] for p in self.circuit_patterns[ip][-10:]]
+        if len(patterns) > 5:
+            depths = [p["depth"] for p in patterns[-10:]]
             if len(depths) > 1:
                 depth_increase = max(depths) - min(depths)
                 depth_variance = sum((d - sum(depths)/len(depths))**2 for d in depths) / len(depths)
@@ -156,7 +170,7 @@ class QuantumThreatDetector:
                     evidence = {
                         "depth_variance": depth_variance,
                         "depth_increase": depth_increase,
-                        "pattern_count": len(self.circuit_patterns[ip])
+                        "pattern_count": len(patterns)
                     }
         
         return (is_detected, risk_score, evidence)
@@ -170,33 +184,35 @@ class QuantumThreatDetector:
         - Systematic query patterns
         - Parameter sweep across oracle inputs
         """
-        ip = request.get("ip", "unknown")
+        iid = self._iid(request.get("ip", "unknown"))
         is_oracle_query = request.get("operation_type") == "oracle"
         
-        if ip not in self.oracle_query_log:
-            self.oracle_query_log[ip] = []
+        queries = self.oracle_query_log.get(iid)
+        if queries is None:
+            queries = self.oracle_query_log[iid] = deque()
         
+        now = time.time()
         if is_oracle_query:
-            self.oracle_query_log[ip].append(time.time())
+            queries.append(now)
         
-        # Clean old entries
-        cutoff_time = time.time() - 60  # Last minute
-        self.oracle_query_log[ip] = [t for t in self.oracle_query_log[ip] 
-                                     if t > cutoff_time]
+        # Clean old entries; timestamps are appended in order, so expired
+        # ones are always at the left
+        cutoff_time = now - 60  # Last minute
+        while queries and queries[0] <= cutoff_time:
+            queries.popleft()
         
         is_detected = False
         risk_score = 0.0
         evidence = {}
         
-        queries_per_minute = len(self.oracle_query_log[ip])
+        queries_per_minute = len(queries)
         if queries_per_minute > 100:  # Threshold
             is_detected = True
             risk_score = min(100, 50 + (queries_per_minute - 100) / 2)
             evidence = {
                 "qpm": queries_per_minute,
                 "threshold": 100,
-                "recent_queries": len([t for t in self.oracle_query_log[ip] 
-                                      if t > time.time() - 10])
+                "recent_queries": sum(1 for t in queries if t > now - 10)
             }
         
         return (is_detected, risk_score, evidence)
@@ -291,8 +307,9 @@ class QuantumThreatDetector:
         
         if len(execution_times) > 10:
             # Calculate variance
-            mean_time = sum(execution_times) / len(execution_times)
-            variance = sum((t - mean_time)**2 for t in execution_times) / len(execution_times)
+            times = np.asarray(execution_times, dtype=np.float64)
+            mean_time = float(times.mean())
+            variance = float(times.var())
             stddev = variance ** 0.5
             
             # Coefficient of variation
@@ -302,9 +319,15 @@ class QuantumThreatDetector:
             if cv > 0.5:  # 50% variance threshold
                 is_detected = True
                 risk_score = min(100, 40 + cv * 100)
+                
+                # Gap between the slow and fast groups, in standard deviations
+                slow = times >= mean_time
+                separation = (times[slow].mean() - times[~slow].mean()) / stddev
+                
                 evidence = {
                     "timing_variance": variance,
                     "coefficient_of_variation": cv,
+                    "bimodal_separation": float(separation),
                     "measurements_count": len(execution_times)
                 }
         
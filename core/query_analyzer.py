@@ -4,10 +4,154 @@ Filters out legitimate queries before triggering defensive responses
 """
 import re
 import hashlib
-from typing import Dict, Any, List, Tuple
+import ipaddress
+from typing import Dict, Any, List, Tuple, Callable, Optional
 from dataclasses import dataclass
-from collections import defaultdict
+from collections import OrderedDict
 import time
+import numpy as np
+
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in when numba is not installed"""
+        def decorator(func):
+            return func
+        return decorator
+
+
+# Private IPv4 ranges as (network, mask) integer pairs
+_INTERNAL_NETS = tuple(
+    (int(net.network_address), int(net.netmask))
+    for net in map(ipaddress.IPv4Network, ["127.0.0.0/8", "10.0.0.0/8", "192.168.0.0/16", "172.16.0.0/12"])
+)
+
+# Common words whose presence suggests natural language
+_COMMON_WORDS = frozenset({"the", "is", "are", "what", "how", "can", "please", "help"})
+
+TIMING_WINDOW = 20  # Timestamps considered by the timing-variance check
+HISTORY_SIZE = 200  # Requests retained per user
+REPUTATION_CAPACITY = 100000  # Reputation entries kept before LRU eviction
+USER_HISTORY_CAPACITY = 100000  # Users with history kept before LRU eviction
+
+# Bit flags stored per history entry
+FLAG_BACKTRACK = 1
+FLAG_HESITATION = 2
+
+
+@njit(cache=True, fastmath=True)
+def _interval_variance(ts):
+    """
+    Population variance of the intervals between consecutive timestamps;
+    used to seed the running statistics after a bulk load
+    """
+    n = ts.shape[0] - 1
+    if n < 1:
+        return 0.0
+    mean = (ts[n] - ts[0]) / n
+    acc = 0.0
+    for i in range(n):
+        d = ts[i + 1] - ts[i] - mean
+        acc += d * d
+    return acc / n
+
+
+class UserHistory:
+    """
+    Per-user request history as columnar ring buffers
+    
+    Every entry is written twice, at head and head + capacity, so the most
+    recent n entries are always one contiguous, oldest-first slice. Mean and
+    M2 of the intervals between the last TIMING_WINDOW timestamps are kept
+    with Welford updates, so the timing check reads the variance in O(1).
+    """
+    __slots__ = ("capacity", "ts", "flags", "head", "size", "n_intervals", "mean", "m2")
+    
+    def __init__(self, capacity: int = HISTORY_SIZE):
+        self.capacity = capacity
+        self.ts = np.zeros(2 * capacity, dtype=np.float64)
+        self.flags = np.zeros(2 * capacity, dtype=np.uint8)
+        self.head = 0
+        self.size = 0
+        self.n_intervals = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def append(self, timestamp: float, flags: int = 0):
+        """Record one request"""
+        head, cap = self.head, self.capacity
+        if self.size:
+            ts = self.ts
+            end = head + cap
+            if self.size >= TIMING_WINDOW:
+                # The oldest timestamp of the window drops out with its interval
+                self._remove_interval(float(ts[end - TIMING_WINDOW + 1] - ts[end - TIMING_WINDOW]))
+            self._add_interval(timestamp - float(ts[end - 1]))
+        self.ts[head] = self.ts[head + cap] = timestamp
+        self.flags[head] = self.flags[head + cap] = flags
+        self.head = (head + 1) % cap
+        if self.size < cap:
+            self.size += 1
+    
+    def extend(self, timestamps: np.ndarray, flags: Optional[np.ndarray] = None):
+        """Record many requests at once, oldest first (e.g. a log replay)"""
+        cap = self.capacity
+        ts = np.asarray(timestamps, dtype=np.float64)[-cap:]
+        fl = np.zeros(len(ts), dtype=np.uint8) if flags is None else np.asarray(flags, dtype=np.uint8)[-cap:]
+        if not len(ts):
+            return
+        idx = (self.head + np.arange(len(ts))) % cap
+        self.ts[idx] = self.ts[idx + cap] = ts
+        self.flags[idx] = self.flags[idx + cap] = fl
+        self.head = (self.head + len(ts)) % cap
+        self.size = min(cap, self.size + len(ts))
+        
+        # Reseed the running statistics from the new window in one pass
+        window = self.last_timestamps(TIMING_WINDOW)
+        n = len(window) - 1
+        self.n_intervals = max(n, 0)
+        self.mean = float(window[-1] - window[0]) / n if n > 0 else 0.0
+        self.m2 = float(_interval_variance(window)) * n if n > 0 else 0.0
+    
+    def interval_variance(self) -> float:
+        """Population variance of the intervals within the timing window"""
+        if not self.n_intervals:
+            return 0.0
+        return max(0.0, self.m2 / self.n_intervals)
+    
+    def _add_interval(self, x: float):
+        n = self.n_intervals + 1
+        d = x - self.mean
+        self.mean += d / n
+        self.m2 += d * (x - self.mean)
+        self.n_intervals = n
+    
+    def _remove_interval(self, x: float):
+        n = self.n_intervals - 1
+        if n <= 0:
+            self.n_intervals, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        d = x - self.mean
+        self.mean -= d / n
+        self.m2 -= d * (x - self.mean)
+        self.n_intervals = n
+    
+    def last_timestamps(self, n: int) -> np.ndarray:
+        """View of the last n timestamps, oldest first"""
+        end = self.head + self.capacity
+        return self.ts[end - min(n, self.size):end]
+    
+    def last_flags(self, n: int) -> np.ndarray:
+        """View of the last n flag bytes, oldest first"""
+        end = self.head + self.capacity
+        return self.flags[end - min(n, self.size):end]
 
 
 @dataclass
@@ -33,18 +177,87 @@ class QueryAnalyzer:
         self.whitelist_patterns = self.safety_config.get("whitelist_patterns", [])
         
         # Track user behavior for safety assessment
-        self.user_history = defaultdict(list)
-        self.reputation_scores = defaultdict(lambda: 0.5)  # Start neutral
+        self.user_history: "OrderedDict[str, UserHistory]" = OrderedDict()  # LRU; created on first recorded request
+        self.reputation_scores = OrderedDict()  # LRU; unknown sources start neutral (0.5)
+        if _NUMBA_AVAILABLE:
+            _interval_variance(np.zeros(2, dtype=np.float64))  # JIT warmup
+        
+        # Precompiled patterns used on every suspicious query; the attack,
+        # attack-type and typo alternations each scan the query in a single pass
+        self._attack_re = re.compile(
+            r"<script|javascript:|drop\s+table|exec\s*\(|\.\./", re.IGNORECASE
+        )
+        self._attack_type_re = re.compile(
+            r"(?P<sql_injection>select|union|insert)|(?P<directory_traversal>\.\./|\.\.\\)",
+            re.IGNORECASE
+        )
+        self._bot_re = re.compile(r"bot|crawler|spider|scraper|curl|wget", re.IGNORECASE)
+        self._typo_re = re.compile(r"(\w)\1{2,}|\w{15,}")  # Triple letters, very long words
+        
+        # Stage checks as (config name, indicator key, check), cheapest first;
+        # every check scores in [0, 1]; ip_check is a precomputed IP reputation
+        # result from analyze_batch, if any
+        self._safety_checks = [
+            ("ip_reputation", "ip_reputation", lambda q, m, u, now, ip_check: ip_check or self._check_ip_reputation(m)),
+            ("rate_limit", "rate_limit", lambda q, m, u, now, ip_check: self._check_rate_limit(u, now)),
+            ("timing_patterns", "timing", lambda q, m, u, now, ip_check: self._check_timing_safety(u)),
+            ("fingerprinting", "fingerprint", lambda q, m, u, now, ip_check: self._check_fingerprint_safety(m)),
+            ("ml_pattern_detection", "ml_pattern", lambda q, m, u, now, ip_check: self._check_ml_safety(q, m)),
+            ("content_analysis", "content", lambda q, m, u, now, ip_check: self._check_content_safety(q)),
+        ]
+        
+        # Verification stages resolved once into
+        # (stage number, pass threshold, configured check count, [(indicator key, check)])
+        self._stages = [
+            (
+                stage_config.get("stage", 0),
+                stage_config.get("pass_threshold", 0.5),
+                len(stage_config.get("checks", [])),
+                [(indicator_key, check) for name, indicator_key, check in self._safety_checks
+                 if name in stage_config.get("checks", [])]
+            )
+            for stage_config in self.verification_stages
+        ]
+        
+        # Whitelist patterns resolved once into (name, [check(query, metadata)])
+        self._whitelist_checks = [
+            (pattern_config.get("name", ""), self._compile_whitelist(
+                pattern_config.get("indicators", []), pattern_config.get("conditions", [])
+            ))
+            for pattern_config in self.whitelist_patterns
+        ]
         
     def analyze_query(self, query: str, metadata: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
         """
         Analyze a query and determine if it's safe or suspicious
         Returns: (is_safe, analysis_details)
         """
+        return self._analyze(query, metadata, time.time())
+    
+    def analyze_batch(self, queries: List[str], 
+                      metadata_list: List[Dict[str, Any]]) -> List[Tuple[bool, Dict[str, Any]]]:
+        """
+        Analyze a batch of concurrent queries
+        IP reputation for the whole batch is scored in one vectorized pass
+        against reputations at batch start; the remaining checks run per query
+        Each query is judged at its own time: metadata["timestamp"] when the
+        caller supplies one, otherwise a fresh clock read, so a batch never
+        collapses several requests onto one instant
+        Returns: list of (is_safe, analysis_details) in input order
+        """
+        ip_checks = self._batch_ip_reputation([m.get("ip", "") for m in metadata_list])
+        return [
+            self._analyze(query, metadata, metadata.get("timestamp") or time.time(), ip_check)
+            for query, metadata, ip_check in zip(queries, metadata_list, ip_checks)
+        ]
+    
+    def _analyze(self, query: str, metadata: Dict[str, Any], now: float,
+                 ip_check: Optional[Tuple[float, List[str]]] = None) -> Tuple[bool, Dict[str, Any]]:
+        """Shared single-query analysis path"""
         user_id = metadata.get("user_id", metadata.get("ip", "unknown"))
         
         # Multi-stage safety verification
-        safety_result = self._multi_stage_safety_check(query, metadata, user_id)
+        safety_result = self._multi_stage_safety_check(query, metadata, user_id, now, ip_check)
         
         if safety_result.is_safe:
             # Update positive reputation
@@ -79,60 +292,32 @@ class QueryAnalyzer:
         }
     
     def _multi_stage_safety_check(self, query: str, metadata: Dict[str, Any], 
-                                   user_id: str) -> SafetyCheckResult:
+                                   user_id: str, now: float,
+                                   ip_check: Optional[Tuple[float, List[str]]] = None) -> SafetyCheckResult:
         """
         Multi-stage verification process
         Each stage has increasing scrutiny
         """
         
-        for stage_config in self.verification_stages:
-            stage_num = stage_config.get("stage", 0)
-            checks = stage_config.get("checks", [])
-            threshold = stage_config.get("pass_threshold", 0.5)
-            
+        for stage_num, threshold, num_checks, stage_checks in self._stages:
             # Run checks for this stage
             safety_score = 0.0
             reasons = []
             indicators = {}
+            remaining = num_checks
             
-            if "ip_reputation" in checks:
-                ip_score, ip_reasons = self._check_ip_reputation(metadata)
-                safety_score += ip_score
-                reasons.extend(ip_reasons)
-                indicators["ip_reputation"] = ip_score
-            
-            if "rate_limit" in checks:
-                rate_score, rate_reasons = self._check_rate_limit(user_id)
-                safety_score += rate_score
-                reasons.extend(rate_reasons)
-                indicators["rate_limit"] = rate_score
-            
-            if "timing_patterns" in checks:
-                timing_score, timing_reasons = self._check_timing_safety(user_id)
-                safety_score += timing_score
-                reasons.extend(timing_reasons)
-                indicators["timing"] = timing_score
-            
-            if "content_analysis" in checks:
-                content_score, content_reasons = self._check_content_safety(query)
-                safety_score += content_score
-                reasons.extend(content_reasons)
-                indicators["content"] = content_score
-            
-            if "ml_pattern_detection" in checks:
-                ml_score, ml_reasons = self._check_ml_safety(query, metadata)
-                safety_score += ml_score
-                reasons.extend(ml_reasons)
-                indicators["ml_pattern"] = ml_score
-            
-            if "fingerprinting" in checks:
-                fp_score, fp_reasons = self._check_fingerprint_safety(metadata)
-                safety_score += fp_score
-                reasons.extend(fp_reasons)
-                indicators["fingerprint"] = fp_score
+            # Checks run cheapest first; stop once the stage can no longer pass
+            for indicator_key, check in stage_checks:
+                score, check_reasons = check(query, metadata, user_id, now, ip_check)
+                safety_score += score
+                reasons.extend(check_reasons)
+                indicators[indicator_key] = score
+                
+                remaining -= 1
+                if (safety_score + remaining * 1.0) / num_checks < threshold:
+                    break
             
             # Normalize score
-            num_checks = len(checks)
             normalized_score = safety_score / num_checks if num_checks > 0 else 0.0
             
             # If passed this stage, query is considered safe
@@ -163,7 +348,7 @@ class QueryAnalyzer:
             return 0.9, ["Internal IP address"]
         
         # Check reputation score
-        reputation = self.reputation_scores.get(ip, 0.5)
+        reputation = self._get_reputation(ip)
         
         if reputation > 0.7:
             return 0.8, [f"Good IP reputation: {reputation:.2f}"]
@@ -172,12 +357,56 @@ class QueryAnalyzer:
         else:
             return 0.2, [f"Poor IP reputation: {reputation:.2f}"]
     
-    def _check_rate_limit(self, user_id: str) -> Tuple[float, List[str]]:
+    def _batch_ip_reputation(self, ips: List[str]) -> List[Tuple[float, List[str]]]:
+        """Vectorized equivalent of _check_ip_reputation over many IPs"""
+        n = len(ips)
+        internal = np.fromiter((self._is_internal_ip(ip) for ip in ips), dtype=bool, count=n)
+        reps = np.fromiter((self._get_reputation(ip) for ip in ips), dtype=np.float64, count=n)
+        levels = np.where(reps > 0.7, 2, np.where(reps > 0.4, 1, 0))
+        scores = np.where(internal, 0.9, np.array([0.2, 0.5, 0.8])[levels])
+        
+        labels = ("Poor", "Neutral", "Good")
+        return [
+            (0.9, ["Internal IP address"]) if is_internal
+            else (score, [f"{labels[level]} IP reputation: {rep:.2f}"])
+            for is_internal, score, level, rep in zip(internal.tolist(), scores.tolist(), levels.tolist(), reps.tolist())
+        ]
+    
+    def _record_request(self, user_id: str, now: float, metadata: Dict[str, Any]):
+        """Append a request to the user's history"""
+        flags = 0
+        if metadata.get("backtrack", False):
+            flags |= FLAG_BACKTRACK
+        if metadata.get("hesitation", False):
+            flags |= FLAG_HESITATION
+        self._history_for_write(user_id).append(now, flags)
+    
+    def replay_history(self, user_id: str, timestamps: np.ndarray, flags: Optional[np.ndarray] = None):
+        """
+        Bulk-load a user's past requests, oldest first (log replay, audits)
+        flags are per-request FLAG_BACKTRACK / FLAG_HESITATION bits
+        """
+        self._history_for_write(user_id).extend(timestamps, flags)
+    
+    def _history_for_write(self, user_id: str) -> UserHistory:
+        """User's history, created if needed and marked recently used"""
+        user_history = self.user_history
+        history = user_history.get(user_id)
+        if history is None:
+            history = user_history[user_id] = UserHistory()
+            if len(user_history) > USER_HISTORY_CAPACITY:
+                user_history.popitem(last=False)
+        else:
+            user_history.move_to_end(user_id)
+        return history
+    
+    def _check_rate_limit(self, user_id: str, now: float) -> Tuple[float, List[str]]:
         """Check if within reasonable rate limits"""
-        recent_requests = [r for r in self.user_history[user_id] 
-                          if r["timestamp"] > time.time() - 60]
-        
-        requests_per_minute = len(recent_requests)
+        history = self.user_history.get(user_id)
+        if history is None:
+            return 0.9, ["Normal request rate"]
+        recent = history.last_timestamps(history.size)
+        requests_per_minute = int(np.count_nonzero(recent > now - 60))
         
         if requests_per_minute < 10:
             return 0.9, ["Normal request rate"]
@@ -188,23 +417,18 @@ class QueryAnalyzer:
     
     def _check_timing_safety(self, user_id: str) -> Tuple[float, List[str]]:
         """Check for human-like timing patterns"""
-        history = self.user_history[user_id]
+        history = self.user_history.get(user_id)
         
-        if len(history) < 5:
+        if history is None or len(history) < 5:
             return 0.7, ["Insufficient history"]
         
         # Check for human errors (backtracking, hesitation)
-        has_backtracking = any(r.get("backtrack", False) for r in history[-10:])
-        has_hesitation = any(r.get("hesitation", False) for r in history[-10:])
-        
-        if has_backtracking or has_hesitation:
+        if history.last_flags(10).any():
             return 0.9, ["Human-like behavior detected (errors, hesitation)"]
         
         # Check timing variance
-        timestamps = [r["timestamp"] for r in history[-20:]]
-        if len(timestamps) > 1:
-            intervals = [timestamps[i+1] - timestamps[i] for i in range(len(timestamps)-1)]
-            variance = sum((x - sum(intervals)/len(intervals))**2 for x in intervals) / len(intervals)
+        if history.n_intervals:
+            variance = history.interval_variance()
             
             if variance > 1.0:  # High variance = human
                 return 0.8, ["Variable timing suggests human user"]
@@ -254,8 +478,7 @@ class QueryAnalyzer:
             return 0.7, ["Standard browser user agent"]
         
         # Check for bot-like user agents
-        bot_indicators = ["bot", "crawler", "spider", "scraper", "curl", "wget"]
-        if any(indicator in user_agent.lower() for indicator in bot_indicators):
+        if self._bot_re.search(user_agent):
             return 0.2, ["Bot-like user agent"]
         
         return 0.5, ["User agent check inconclusive"]
@@ -270,13 +493,8 @@ class QueryAnalyzer:
         is_safe = False
         
         # Check whitelist patterns
-        for pattern_config in self.whitelist_patterns:
-            pattern_name = pattern_config.get("name", "")
-            indicators = pattern_config.get("indicators", [])
-            conditions = pattern_config.get("conditions", [])
-            
-            # Check if matches whitelist pattern
-            if self._matches_whitelist(query, metadata, indicators, conditions):
+        for pattern_name, checks in self._whitelist_checks:
+            if self._matches_whitelist(query, metadata, checks):
                 reasons.append(f"Matches whitelist pattern: {pattern_name}")
                 is_safe = True
                 break
@@ -303,13 +521,14 @@ class QueryAnalyzer:
             "indicators": []
         }
         
-        # Determine attack type
-        if re.search(r"(?i)(select|union|insert)", query):
+        # Determine attack type (SQL keywords take precedence over traversal)
+        matched = {m.lastgroup for m in self._attack_type_re.finditer(query)}
+        if "sql_injection" in matched:
             analysis["attack_type"] = "sql_injection"
             analysis["confidence"] = 0.9
             analysis["indicators"].append("SQL keywords detected")
         
-        elif re.search(r"\.\./|\.\.\\", query):
+        elif "directory_traversal" in matched:
             analysis["attack_type"] = "directory_traversal"
             analysis["confidence"] = 0.85
             analysis["indicators"].append("Path traversal detected")
@@ -325,44 +544,48 @@ class QueryAnalyzer:
         
         return analysis
     
+    def _get_reputation(self, key: str) -> float:
+        """Read a reputation score, marking it recently used"""
+        score = self.reputation_scores.get(key)
+        if score is None:
+            return 0.5
+        self.reputation_scores.move_to_end(key)
+        return score
+    
     def _update_reputation(self, user_id: str, positive: bool):
         """Update user reputation score"""
-        current = self.reputation_scores[user_id]
+        current = self._get_reputation(user_id)
         
         if positive:
             self.reputation_scores[user_id] = min(current + 0.05, 1.0)
         else:
             self.reputation_scores[user_id] = max(current - 0.1, 0.0)
+        
+        if len(self.reputation_scores) > REPUTATION_CAPACITY:
+            self.reputation_scores.popitem(last=False)
     
     def _is_internal_ip(self, ip: str) -> bool:
         """Check if IP is internal"""
-        internal_ranges = ["127.", "10.", "192.168.", "172.16."]
-        return any(ip.startswith(prefix) for prefix in internal_ranges)
+        try:
+            addr = int(ipaddress.IPv4Address(ip))
+        except ValueError:
+            return False
+        return any(addr & mask == net for net, mask in _INTERNAL_NETS)
     
     def _has_typos(self, query: str) -> bool:
         """Simple typo detection"""
         # Check for common typos: double letters, missing spaces, etc.
-        common_typos = [r"(\w)\1{2,}", r"\w{15,}"]  # Triple letters, very long words
-        return any(re.search(pattern, query) for pattern in common_typos)
+        return self._typo_re.search(query) is not None
     
     def _is_natural_language(self, query: str) -> bool:
         """Check if query looks like natural language"""
         # Simple heuristic: presence of common words and sentence structure
-        common_words = ["the", "is", "are", "what", "how", "can", "please", "help"]
         words = query.lower().split()
-        common_count = sum(1 for word in words if word in common_words)
-        return common_count > 0 and len(words) > 3
+        return len(words) > 3 and any(word in _COMMON_WORDS for word in words)
     
     def _has_obvious_attack_patterns(self, query: str) -> bool:
         """Check for obvious attack patterns"""
-        attack_patterns = [
-            r"<script",
-            r"javascript:",
-            r"(?i)drop\s+table",
-            r"(?i)exec\s*\(",
-            r"\.\./"
-        ]
-        return any(re.search(pattern, query, re.IGNORECASE) for pattern in attack_patterns)
+        return self._attack_re.search(query) is not None
     
     def _looks_like_ml_probing(self, query: str, metadata: Dict[str, Any]) -> bool:
         """Check if query looks like ML model probing"""
@@ -373,25 +596,27 @@ class QueryAnalyzer:
         
         return has_many_params and has_numeric_params
     
-    def _matches_whitelist(self, query: str, metadata: Dict[str, Any], 
-                          indicators: List[str], conditions: List[str]) -> bool:
-        """Check if query matches whitelist criteria"""
+    def _compile_whitelist(self, indicators: List[str], conditions: List[str]) -> List[Callable]:
+        """Resolve whitelist indicator/condition names into check callables"""
+        indicator_checks = {
+            "typos_present": lambda q, m: self._has_typos(q),
+            "mouse_movement": lambda q, m: m.get("has_mouse_events", False),
+            # "backtracking" would need more context from session history
+        }
+        condition_checks = [
+            ("valid_session", lambda q, m: m.get("session_valid", False)),
+            ("internal_ip", lambda q, m: self._is_internal_ip(m.get("ip", ""))),
+        ]
         
-        # Check indicators
-        for indicator in indicators:
-            if indicator == "typos_present" and self._has_typos(query):
-                return True
-            elif indicator == "backtracking":
-                # Would need more context from session history
-                pass
-            elif indicator == "mouse_movement" and metadata.get("has_mouse_events", False):
-                return True
-        
-        # Check conditions
+        checks = [indicator_checks[i] for i in indicators if i in indicator_checks]
         for condition in conditions:
-            if "valid_session" in condition and metadata.get("session_valid", False):
-                return True
-            elif "internal_ip" in condition and self._is_internal_ip(metadata.get("ip", "")):
-                return True
-        
-        return False
+            for key, check in condition_checks:
+                if key in condition:
+                    checks.append(check)
+                    break
+        return checks
+    
+    def _matches_whitelist(self, query: str, metadata: Dict[str, Any], 
+                          checks: List[Callable]) -> bool:
+        """Check if query matches whitelist criteria"""
+        return any(check(query, metadata) for check in checks)
@@ -1,9 +1,12 @@
 """
 Risk Scorer - Calculates and categorizes threat levels
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 from dataclasses import dataclass
 from enum import Enum
+from itertools import chain
+from functools import lru_cache
+from bisect import bisect_right
 
 
 class RiskLevel(Enum):
@@ -14,6 +17,49 @@ class RiskLevel(Enum):
     CRITICAL = "critical"
 
 
+# Additional response actions per threat category
+THREAT_ACTIONS = {
+    "ml_attack": ("deploy_model_poisoning", "inject_adversarial_examples"),
+    "sql_injection": ("deploy_sql_honeypot", "inject_fake_database"),
+    "directory_traversal": ("deploy_fake_filesystem",),
+    "bot_activity": ("deploy_timing_traps", "increase_complexity"),
+    "xss_attack": ("sanitize_output", "deploy_xss_trap")
+}
+
+
+_ML_ATTACKS = frozenset({"model_extraction", "model_inversion"})
+_BOT_PATTERNS = frozenset({"timing_anomaly", "behavioral_anomaly"})
+
+# Threat category -> scenario configuration
+SCENARIO_MAPPING = {
+    "ml_attack": "model_extraction",
+    "sql_injection": "sql_injection",
+    "directory_traversal": "directory_traversal",
+    "bot_activity": "api_scraping",
+    "xss_attack": "reconnaissance",
+    "general_suspicious": "reconnaissance"
+}
+
+
+@lru_cache(maxsize=256)
+def _categorize_patterns(patterns: frozenset) -> str:
+    """Priority-based threat categorization of a set of detected patterns"""
+    if not patterns.isdisjoint(_ML_ATTACKS):
+        return "ml_attack"
+    elif "sql_injection" in patterns:
+        return "sql_injection"
+    elif "directory_traversal" in patterns:
+        return "directory_traversal"
+    elif not patterns.isdisjoint(_BOT_PATTERNS):
+        return "bot_activity"
+    elif "xss_attempt" in patterns:
+        return "xss_attack"
+    elif "membership_inference" in patterns:
+        return "ml_attack"
+    else:
+        return "general_suspicious"
+
+
 @dataclass
 class RiskAssessment:
     """Complete risk assessment for a request"""
@@ -38,6 +84,16 @@ class RiskScorer:
         })
         self.response_strategies = config.get("response_policies", {}).get("response_strategies", {})
         
+        # Ascending (boundary, level) pairs; on ties the higher level wins
+        boundaries = sorted([
+            (self.thresholds.get("medium", 60), RiskLevel.MEDIUM),
+            (self.thresholds.get("high", 80), RiskLevel.HIGH),
+            (self.thresholds.get("critical", 95), RiskLevel.CRITICAL)
+        ], key=lambda pair: pair[0])
+        self._level_boundaries = [boundary for boundary, _ in boundaries]
+        self._levels = [RiskLevel.LOW] + [level for _, level in boundaries]
+        self._actions_cache: Dict[Tuple[RiskLevel, str], Tuple[str, ...]] = {}
+        
     def assess_risk(self, risk_score: float, detected_patterns: List[str], 
                    evidence: Dict[str, Any]) -> RiskAssessment:
         """
@@ -69,37 +125,20 @@ class RiskScorer:
     
     def _calculate_risk_level(self, risk_score: float) -> RiskLevel:
         """Convert numeric risk score to risk level"""
-        if risk_score >= self.thresholds.get("critical", 95):
-            return RiskLevel.CRITICAL
-        elif risk_score >= self.thresholds.get("high", 80):
-            return RiskLevel.HIGH
-        elif risk_score >= self.thresholds.get("medium", 60):
-            return RiskLevel.MEDIUM
-        else:
-            return RiskLevel.LOW
+        return self._levels[bisect_right(self._level_boundaries, risk_score)]
     
     def _categorize_threat(self, detected_patterns: List[str]) -> str:
         """Categorize the type of threat based on detected patterns"""
-        
-        # Priority-based categorization
-        if any(p in detected_patterns for p in ["model_extraction", "model_inversion"]):
-            return "ml_attack"
-        elif "sql_injection" in detected_patterns:
-            return "sql_injection"
-        elif "directory_traversal" in detected_patterns:
-            return "directory_traversal"
-        elif any(p in detected_patterns for p in ["timing_anomaly", "behavioral_anomaly"]):
-            return "bot_activity"
-        elif "xss_attempt" in detected_patterns:
-            return "xss_attack"
-        elif "membership_inference" in detected_patterns:
-            return "ml_attack"
-        else:
-            return "general_suspicious"
+        return _categorize_patterns(frozenset(detected_patterns))
     
     def _get_recommended_actions(self, risk_level: RiskLevel, threat_category: str) -> List[str]:
         """Get recommended response actions based on risk level"""
         
+        key = (risk_level, threat_category)
+        cached = self._actions_cache.get(key)
+        if cached is not None:
+            return list(cached)
+        
         base_actions = []
         
         if risk_level == RiskLevel.LOW:
@@ -118,48 +157,26 @@ class RiskScorer:
         # Add threat-specific actions
         threat_specific = self._get_threat_specific_actions(threat_category)
         
-        return list(set(base_actions + threat_specific))
+        # Order-preserving de-duplication
+        actions = self._actions_cache[key] = tuple(dict.fromkeys(chain(base_actions, threat_specific)))
+        return list(actions)
     
     def _get_threat_specific_actions(self, threat_category: str) -> List[str]:
         """Get actions specific to the threat type"""
-        
-        threat_actions = {
-            "ml_attack": ["deploy_model_poisoning", "inject_adversarial_examples"],
-            "sql_injection": ["deploy_sql_honeypot", "inject_fake_database"],
-            "directory_traversal": ["deploy_fake_filesystem"],
-            "bot_activity": ["deploy_timing_traps", "increase_complexity"],
-            "xss_attack": ["sanitize_output", "deploy_xss_trap"]
-        }
-        
-        return threat_actions.get(threat_category, [])
+        return list(THREAT_ACTIONS.get(threat_category, ()))
     
     def _calculate_confidence(self, evidence: Dict[str, Any], 
                             detected_patterns: List[str]) -> float:
         """Calculate confidence in the risk assessment"""
         
-        # Base confidence on amount and quality of evidence
-        confidence = 0.0
-        
-        # More evidence types = higher confidence
-        evidence_types = len(evidence.keys())
-        confidence += min(evidence_types * 0.15, 0.5)
-        
-        # Multiple detected patterns = higher confidence
-        pattern_count = len(detected_patterns)
-        confidence += min(pattern_count * 0.1, 0.3)
-        
-        # Specific high-confidence indicators
-        if "timing" in evidence:
-            timing_data = evidence["timing"]
-            if "coefficient_of_variation" in timing_data:
-                cv = timing_data["coefficient_of_variation"]
-                if cv < 0.05:  # Very consistent = high confidence
-                    confidence += 0.2
-        
-        if "content" in evidence:
-            # Direct pattern matches are high confidence
-            confidence += 0.2
-        
+        # More evidence types and more detected patterns = higher confidence;
+        # very consistent timing (CV < 0.05) and direct content matches add a fixed bonus
+        confidence = (
+            min(len(evidence) * 0.15, 0.5)
+            + min(len(detected_patterns) * 0.1, 0.3)
+            + (0.2 if evidence.get("timing", {}).get("coefficient_of_variation", 1.0) < 0.05 else 0.0)
+            + (0.2 if "content" in evidence else 0.0)
+        )
         return min(confidence, 1.0)
     
     def _summarize_evidence(self, evidence: Dict[str, Any], 
@@ -201,14 +218,4 @@ class RiskScorer:
     
     def get_scenario_for_threat(self, threat_category: str) -> str:
         """Map threat category to scenario configuration"""
-        
-        scenario_mapping = {
-            "ml_attack": "model_extraction",
-            "sql_injection": "sql_injection",
-            "directory_traversal": "directory_traversal",
-            "bot_activity": "api_scraping",
-            "xss_attack": "reconnaissance",
-            "general_suspicious": "reconnaissance"
-        }
-        
-        return scenario_mapping.get(threat_category, "api_scraping")
+        return SCENARIO_MAPPING.get(threat_category, "api_scraping")
@@ -1,33 +1,54 @@
 """Fake data factory for generating realistic but poisoned data."""
 
+from decimal import Decimal
 from faker import Faker
 from typing import Dict, List, Any
 
 
 class FakeDataFactory:
     """Factory for generating various types of fake data with tracking."""
-    
+
     def __init__(self):
         self.faker = Faker()
-    
+
     def generate_user_data(self, count: int, tracking_token: str) -> List[Dict]:
         """Generate fake user records."""
-        return [{
-            "id": i,
-            "name": self.faker.name(),
-            "email": self.faker.email(),
-            "ssn": self.faker.ssn(),
-            "credit_card": f"{self.faker.credit_card_number()}_{tracking_token[:4]}",
-            "address": self.faker.address(),
-            "tracking_token": tracking_token
-        } for i in range(count)]
-    
+        # Bind provider methods and the token suffix once for the whole batch
+        name = self.faker.name
+        email = self.faker.email
+        ssn = self.faker.ssn
+        credit_card_number = self.faker.credit_card_number
+        address = self.faker.address
+        token_suffix = f"_{tracking_token[:4]}"
+
+        records = [None] * count
+        for i in range(count):
+            records[i] = {
+                "id": i,
+                "name": name(),
+                "email": email(),
+                "ssn": ssn(),
+                "credit_card": credit_card_number() + token_suffix,
+                "address": address(),
+                "tracking_token": tracking_token
+            }
+        return records
+
     def generate_financial_data(self, count: int, tracking_token: str) -> List[Dict]:
         """Generate fake financial records."""
-        return [{
-            "transaction_id": self.faker.uuid4(),
-            "amount": self.faker.pydecimal(left_digits=5, right_digits=2, positive=True),
-            "account": f"{self.faker.bban()}_{tracking_token[:6]}",
-            "description": self.faker.bs(),
-            "tracking_token": tracking_token
-        } for i in range(count)]
+        uuid4 = self.faker.uuid4
+        uniform = self.faker.random.uniform  # Shares Faker's seeding
+        bban = self.faker.bban
+        bs = self.faker.bs
+        token_suffix = f"_{tracking_token[:6]}"
+
+        records = [None] * count
+        for i in range(count):
+            records[i] = {
+                "transaction_id": uuid4(),
+                "amount": Decimal(f"{uniform(0.01, 99999.99):.2f}"),
+                "account": bban() + token_suffix,
+                "description": bs(),
+                "tracking_token": tracking_token
+            }
+        return records
@@ -1,100 +1,233 @@
 """Honeypot generator for creating enticing fake endpoints and data."""
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from itertools import accumulate
+from types import MethodType
 from faker import Faker
+from faker.providers import BaseProvider
+import json
+import os
 import secrets
-import hashlib
+import string
+import uuid
 
 
-class HoneypotGenerator:
-    """Generates honeypot endpoints and fake data to trap attackers."""
-    
-    def __init__(self, tracking_token_manager=None):
-        self.faker = Faker()
-        self.token_manager = tracking_token_manager
-        
-    def generate_fake_env_file(self, tracking_token: str = None) -> str:
-        """Generate a convincing fake .env file."""
-        if not tracking_token:
-            tracking_token = self._generate_token()
-        
-        return f"""# Environment Configuration
+_original_random_element = BaseProvider.random_element
+
+
+def _cached_random_element(self, elements=("a", "b", "c")):
+    """
+    Drop-in for BaseProvider.random_element that caches the key tuple and
+    cumulative weights on weighted OrderedDicts instead of rebuilding the
+    choice list on every call.
+    """
+    rng = self.generator.random
+    if isinstance(elements, OrderedDict):
+        cached = getattr(elements, "_cached_choice_list", None)
+        if cached is None:
+            cached = (tuple(elements.keys()), tuple(accumulate(elements.values())))
+            elements._cached_choice_list = cached
+        keys, cum_weights = cached
+        if self.__use_weighting__:
+            return rng.choices(keys, cum_weights=cum_weights)[0]
+        return rng.choice(keys)
+    if isinstance(elements, (list, tuple, str)):
+        return rng.choice(elements)
+    return _original_random_element(self, elements)
+
+
+def _install_cached_random_element(faker: Faker):
+    """
+    Route one Faker instance's providers (user_name, email, bs, ...) through
+    _cached_random_element; other Faker instances in the process keep the
+    stock implementation
+    """
+    for generator in faker.factories:
+        for provider in generator.providers:
+            provider.random_element = MethodType(_cached_random_element, provider)
+        # The generator also exposes the method it bound from one provider
+        generator.random_element = generator.random_element.__self__.random_element
+
+
+# Static skeletons for generated files; only the substituted fields vary per call
+ENV_FILE_TEMPLATE = """# Environment Configuration
 # DO NOT COMMIT THIS FILE
 
 # Database
 DB_HOST=prod-db-01.internal.company.com
 DB_PORT=5432
 DB_NAME=production
-DB_USER=admin_{tracking_token[:8]}
-DB_PASSWORD={self.faker.password(length=32)}_{tracking_token}
+DB_USER=admin_{token_8}
+DB_PASSWORD={db_password}_{tracking_token}
 
 # API Keys
-API_KEY={self.faker.sha256()}_{tracking_token}
-SECRET_KEY={secrets.token_hex(32)}_{tracking_token}
-STRIPE_SECRET_KEY=sk_live_{self.faker.sha256()[:32]}_{tracking_token}
+API_KEY={api_key}_{tracking_token}
+SECRET_KEY={secret_key}_{tracking_token}
+STRIPE_SECRET_KEY=sk_live_{stripe_key}_{tracking_token}
 
 # AWS
-AWS_ACCESS_KEY_ID=AKIA{self.faker.sha256()[:16].upper()}_{tracking_token[:4]}
-AWS_SECRET_ACCESS_KEY={self.faker.sha256()}_{tracking_token}
+AWS_ACCESS_KEY_ID=AKIA{aws_key_id}_{token_4}
+AWS_SECRET_ACCESS_KEY={aws_secret}_{tracking_token}
 AWS_REGION=us-east-1
 
 # JWT
-JWT_SECRET={secrets.token_hex(32)}_{tracking_token}
+JWT_SECRET={jwt_secret}_{tracking_token}
 JWT_EXPIRY=86400
 
 # Redis
 REDIS_HOST=cache-prod.internal.company.com
 REDIS_PORT=6379
-REDIS_PASSWORD={self.faker.password()}_{tracking_token}
+REDIS_PASSWORD={redis_password}_{tracking_token}
 """
+
+YAML_CONFIG_TEMPLATE = """server:
+  host: 0.0.0.0
+  port: 8080
+  debug: false
+
+database:
+  host: db-{token_8}.internal
+  port: 5432
+  name: production
+  user: admin_{token_6}
+  password: {db_password}_{tracking_token}
+
+secrets:
+  jwt_secret: {jwt_secret}_{tracking_token}
+  api_key: {api_key}_{tracking_token}
+
+tracking_token: {tracking_token}
+"""
+
+
+POOL_SIZE = 1024  # Usernames sampled once from Faker for bulk row generation
+ROLES = ("admin", "user", "developer")
+
+# 64 password characters repeated to cover every byte value, so translating
+# random bytes through the table picks each character uniformly
+_PASSWORD_TABLE = ((string.ascii_letters + string.digits + "!@") * 4).encode()
+PASSWORD_LENGTH = 12
+
+
+class HoneypotGenerator:
+    """Generates honeypot endpoints and fake data to trap attackers."""
+    
+    # Building a Faker loads every provider, so instances share one
+    _shared_faker: Optional[Faker] = None
+    
+    def __init__(self, tracking_token_manager=None):
+        if HoneypotGenerator._shared_faker is None:
+            HoneypotGenerator._shared_faker = Faker()
+            _install_cached_random_element(HoneypotGenerator._shared_faker)
+        self.faker = HoneypotGenerator._shared_faker
+        self.token_manager = tracking_token_manager
+        self._username_pool: Tuple[str, ...] = ()
+        self._domain_pool: Tuple[str, ...] = ()
+        self._phrases: Tuple[str, ...] = ()
+    
+    def _name_pools(self) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """Username and email-domain pools, sampled from Faker on first use."""
+        if not self._username_pool:
+            self._username_pool = tuple(self.faker.user_name() for _ in range(POOL_SIZE))
+            # Deduplicated in draw order, so a seeded Faker gives the same pool every run
+            self._domain_pool = tuple(dict.fromkeys(self.faker.free_email_domain() for _ in range(64)))
+        return self._username_pool, self._domain_pool
+    
+    def _phrase_pool(self) -> Tuple[str, ...]:
+        """Business-speak descriptions, sampled from Faker on first use."""
+        if not self._phrases:
+            self._phrases = tuple(self.faker.bs() for _ in range(POOL_SIZE))
+        return self._phrases
+    
+    def _random_timestamps(self, count: int) -> List[str]:
+        """ISO timestamps spread uniformly between the epoch and now."""
+        randrange = self.faker.random.randrange
+        now = datetime.now().replace(microsecond=0)
+        max_age = int((now - datetime(1970, 1, 1)).total_seconds())
+        return [(now - timedelta(seconds=randrange(max_age))).isoformat() for _ in range(count)]
+        
+    def generate_fake_env_file(self, tracking_token: str = None) -> str:
+        """Generate a convincing fake .env file."""
+        if not tracking_token:
+            tracking_token = self._generate_token()
+        
+        return ENV_FILE_TEMPLATE.format(
+            tracking_token=tracking_token,
+            token_8=tracking_token[:8],
+            token_4=tracking_token[:4],
+            db_password=self.faker.password(length=32),
+            api_key=self.faker.sha256(),
+            secret_key=secrets.token_hex(32),
+            stripe_key=self.faker.sha256()[:32],
+            aws_key_id=self.faker.sha256()[:16].upper(),
+            aws_secret=self.faker.sha256(),
+            jwt_secret=secrets.token_hex(32),
+            redis_password=self.faker.password()
+        )
     
     def generate_fake_api_keys(self, count: int = 5, tracking_token: str = None) -> List[Dict[str, str]]:
         """Generate fake API keys."""
         if not tracking_token:
             tracking_token = self._generate_token()
         
-        keys = []
-        for i in range(count):
-            keys.append({
-                "key_id": f"key_{self.faker.uuid4()}",
-                "api_key": f"{self.faker.sha256()[:32]}_{tracking_token}",
-                "description": self.faker.bs(),
-                "created_at": self.faker.iso8601(),
+        # One urandom call covers every row's UUID and key material
+        raw = os.urandom(count * 32)
+        key_hex = raw[count * 16:].hex()
+        descriptions = self.faker.random.choices(self._phrase_pool(), k=count)
+        created = self._random_timestamps(count)
+        
+        return [
+            {
+                "key_id": f"key_{uuid.UUID(bytes=raw[i * 16:(i + 1) * 16], version=4)}",
+                "api_key": f"{key_hex[i * 32:(i + 1) * 32]}_{tracking_token}",
+                "description": descriptions[i],
+                "created_at": created[i],
                 "permissions": ["read", "write"],
                 "tracking_token": tracking_token
-            })
-        
-        return keys
+            }
+            for i in range(count)
+        ]
     
     def generate_fake_database_dump(self, table_name: str, row_count: int = 100, tracking_token: str = None) -> str:
         """Generate a fake database SQL dump."""
         if not tracking_token:
             tracking_token = self._generate_token()
         
-        sql = f"-- Database Dump for {table_name}\n"
-        sql += f"-- Generated: {self.faker.iso8601()}\n"
-        sql += f"-- WARNING: Contains tracking token {tracking_token}\n\n"
+        usernames, domains = self._name_pools()
+        choice = self.faker.random.choice
+        randrange = self.faker.random.randrange
+        token_hex = secrets.token_hex
+        now = datetime.now().replace(microsecond=0)
+        max_age = int((now - datetime(1970, 1, 1)).total_seconds())
         
-        sql += f"CREATE TABLE {table_name} (\n"
-        sql += "  id SERIAL PRIMARY KEY,\n"
-        sql += "  username VARCHAR(255),\n"
-        sql += "  email VARCHAR(255),\n"
-        sql += "  password_hash VARCHAR(255),\n"
-        sql += "  api_key VARCHAR(255),\n"
-        sql += "  created_at TIMESTAMP\n"
-        sql += ");\n\n"
+        parts = [
+            f"-- Database Dump for {table_name}\n",
+            f"-- Generated: {self.faker.iso8601()}\n",
+            f"-- WARNING: Contains tracking token {tracking_token}\n\n",
+            f"CREATE TABLE {table_name} (\n"
+            "  id SERIAL PRIMARY KEY,\n"
+            "  username VARCHAR(255),\n"
+            "  email VARCHAR(255),\n"
+            "  password_hash VARCHAR(255),\n"
+            "  api_key VARCHAR(255),\n"
+            "  created_at TIMESTAMP\n"
+            ");\n\n"
+        ]
         
         for i in range(row_count):
-            sql += f"INSERT INTO {table_name} VALUES ("
-            sql += f"{i+1}, "
-            sql += f"'{self.faker.user_name()}', "
-            sql += f"'{self.faker.email()}', "
-            sql += f"'{self.faker.sha256()}', "
-            sql += f"'{self.faker.sha256()[:32]}_{tracking_token}', "
-            sql += f"'{self.faker.iso8601()}'"
-            sql += ");\n"
+            created_at = (now - timedelta(seconds=randrange(max_age))).isoformat()
+            parts.append(
+                f"INSERT INTO {table_name} VALUES ({i+1}, "
+                f"'{choice(usernames)}', "
+                f"'{choice(usernames)}@{choice(domains)}', "
+                f"'{token_hex(32)}', "
+                f"'{token_hex(16)}_{tracking_token}', "
+                f"'{created_at}');\n"
+            )
         
-        return sql
+        return "".join(parts)
     
     def generate_fake_config_file(self, format: str = "json", tracking_token: str = None) -> str:
         """Generate fake configuration file."""
@@ -102,7 +235,6 @@ REDIS_PASSWORD={self.faker.password()}_{tracking_token}
             tracking_token = self._generate_token()
         
         if format == "json":
-            import json
             config = {
                 "server": {
                     "host": "0.0.0.0",
@@ -125,44 +257,45 @@ REDIS_PASSWORD={self.faker.password()}_{tracking_token}
             return json.dumps(config, indent=2)
         
         elif format == "yaml":
-            return f"""server:
-  host: 0.0.0.0
-  port: 8080
-  debug: false
-
-database:
-  host: db-{tracking_token[:8]}.internal
-  port: 5432
-  name: production
-  user: admin_{tracking_token[:6]}
-  password: {self.faker.password()}_{tracking_token}
-
-secrets:
-  jwt_secret: {secrets.token_hex(32)}_{tracking_token}
-  api_key: {self.faker.sha256()}_{tracking_token}
-
-tracking_token: {tracking_token}
-"""
+            return YAML_CONFIG_TEMPLATE.format(
+                tracking_token=tracking_token,
+                token_8=tracking_token[:8],
+                token_6=tracking_token[:6],
+                db_password=self.faker.password(),
+                jwt_secret=secrets.token_hex(32),
+                api_key=self.faker.sha256()
+            )
     
     def generate_honeypot_credentials(self, count: int = 10, tracking_token: str = None) -> List[Dict[str, str]]:
         """Generate fake user credentials."""
         if not tracking_token:
             tracking_token = self._generate_token()
         
-        credentials = []
-        for i in range(count):
-            credentials.append({
-                "user_id": self.faker.uuid4(),
-                "username": self.faker.user_name(),
-                "email": self.faker.email(),
-                "password": self.faker.password(),
-                "api_token": f"{self.faker.sha256()[:32]}_{tracking_token}",
-                "role": self.faker.random_element(["admin", "user", "developer"]),
-                "tracking_token": tracking_token
-            })
+        usernames, domains = self._name_pools()
+        choices = self.faker.random.choices
+        names = choices(usernames, k=count)
+        mailboxes = choices(usernames, k=count)
+        mail_domains = choices(domains, k=count)
+        roles = choices(ROLES, k=count)
+        
+        # One urandom call covers every row's UUID, token and password
+        raw = os.urandom(count * (32 + PASSWORD_LENGTH))
+        token_hex = raw[count * 16:count * 32].hex()
+        passwords = raw[count * 32:].translate(_PASSWORD_TABLE).decode()
         
-        return credentials
+        return [
+            {
+                "user_id": str(uuid.UUID(bytes=raw[i * 16:(i + 1) * 16], version=4)),
+                "username": names[i],
+                "email": f"{mailboxes[i]}@{mail_domains[i]}",
+                "password": passwords[i * PASSWORD_LENGTH:(i + 1) * PASSWORD_LENGTH],
+                "api_token": f"{token_hex[i * 32:(i + 1) * 32]}_{tracking_token}",
+                "role": roles[i],
+                "tracking_token": tracking_token
+            }
+            for i in range(count)
+        ]
     
     def _generate_token(self) -> str:
         """Generate a tracking token."""
-        return hashlib.sha256(secrets.token_bytes(32)).hexdigest()[:16]
+        return secrets.token_hex(8)
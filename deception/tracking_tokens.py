@@ -1,28 +1,46 @@
 """Tracking token management for tracing exfiltrated data."""
 
-import hashlib
+import re
 import secrets
 import time
 from typing import Dict, List
 import json
 
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
+try:
+    import ahocorasick
+    _AHOCORASICK_AVAILABLE = True
+except ImportError:
+    _AHOCORASICK_AVAILABLE = False
+
+TOKEN_LENGTH = 16
+
+# Every TOKEN_LENGTH-long run of hex digits in the data, overlapping
+_TOKEN_WINDOW_RE = re.compile(r"(?=([0-9a-f]{%d}))" % TOKEN_LENGTH)
+
 
 class TrackingTokenManager:
     """Manages tracking tokens embedded in fake data."""
     
     def __init__(self):
         self.tokens = {}  # token -> metadata
+        self._automaton = None  # Built lazily; reset whenever a token is added
         
     def generate_token(self, context: Dict = None) -> str:
         """Generate a unique tracking token."""
-        token_data = f"{secrets.token_hex(16)}{time.time()}"
-        token = hashlib.sha256(token_data.encode()).hexdigest()[:16]
+        token = secrets.token_hex(TOKEN_LENGTH // 2)
         
         self.tokens[token] = {
             "created_at": time.time(),
             "context": context or {},
             "accessed": []
         }
+        self._automaton = None
         
         return token
     
@@ -37,9 +55,34 @@ class TrackingTokenManager:
     
     def is_tracked(self, data: str) -> bool:
         """Check if data contains a tracking token."""
-        return any(token in data for token in self.tokens.keys())
+        tokens = self.tokens
+        if not tokens:
+            return False
+        
+        if _AHOCORASICK_AVAILABLE:
+            if self._automaton is None:
+                automaton = ahocorasick.Automaton()
+                for token in tokens:
+                    automaton.add_word(token, token)
+                automaton.make_automaton()
+                self._automaton = automaton
+            return next(self._automaton.iter(data), None) is not None
+        
+        # Tokens are fixed-length hex, so one pass over candidate windows
+        # with set lookups replaces a substring scan per token
+        return any(m.group(1) in tokens for m in _TOKEN_WINDOW_RE.finditer(data))
     
     def export_log(self, filepath: str):
-        """Export token tracking log."""
-        with open(filepath, 'w') as f:
-            json.dump(self.tokens, f, indent=2)
+        """
+        Export token tracking log as NDJSON, one {"token": ..., **metadata}
+        record per line, written as it is serialized.
+        """
+        with open(filepath, 'wb') as f:
+            write = f.write
+            for token, metadata in self.tokens.items():
+                record = {"token": token, **metadata}
+                if _ORJSON_AVAILABLE:
+                    # Contexts may carry non-str keys, which json coerces too
+                    write(orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE))
+                else:
+                    write(json.dumps(record).encode() + b"\n")
@@ -12,16 +12,171 @@ Features:
 - Connection throttling
 - Resource exhaustion prevention
 """
+import re
+import random
 import time
+import socket
+import heapq
 import hashlib
 from typing import Dict, Any, List, Optional, Tuple
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import secrets
+import numpy as np
 
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
 
-@dataclass
+    def njit(*args, **kwargs):
+        """No-op stand-in when numba is not installed"""
+        def decorator(func):
+            return func
+        return decorator
+
+# Every single-digit addition puzzle, formatted once. These are an anti-bot
+# speed bump rather than a secret, so they are drawn with a plain PRNG
+_MATH_CHALLENGES = tuple(
+    (f"What is {a} + {b}?", str(a + b)) for a in range(10) for b in range(10)
+)
+_challenge_rng = random.Random()
+
+# IPv6 keys are offset past the IPv4 range so the two never collide
+_IPV6_BASE = 1 << 128
+
+
+def _ip_key(ip: str):
+    """
+    Fixed-width integer key for an IP address; anything that does not
+    parse as IPv4 or IPv6 is keyed by ("s", ip), so a client-supplied
+    string can never alias another key such as the global bucket
+    """
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+    except (OSError, TypeError, ValueError):
+        pass
+    try:
+        return _IPV6_BASE | int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+    except (OSError, TypeError, ValueError):
+        return ("s", ip)
+
+
+# Width of the per-key request counters (one bucket per second)
+BUCKET_SECONDS = 60
+TRACKING_CAPACITY = 100000  # Keys kept per tracking table before LRU eviction
+IDLE_TIMEOUT = 3600  # Seconds before an inactive connection is dropped
+CLEANUP_INTERVAL = 5.0  # Seconds between sweeps of expired blocks
+
+# Exponential backoff in seconds, indexed by penalty level (capped)
+MAX_PENALTY_LEVEL = 10
+_BACKOFF = tuple(1 << level for level in range(MAX_PENALTY_LEVEL + 1))
+
+# Authentication-related path fragments ("/api/auth" is covered by "/auth")
+_AUTH_RE = re.compile(r"/(?:login|auth|signin|oauth|token|session)", re.IGNORECASE)
+
+
+@njit(cache=True)
+def _take_tokens(tokens, stamps, caps, rates, global_slot, ip_slot, endpoint_slot, now):
+    """
+    Refill the global, per-IP and per-endpoint buckets and spend one token
+    from each if all three have one. Returns the index of the first
+    exhausted bucket, or -1 when the request is allowed.
+    """
+    slots = (global_slot, ip_slot, endpoint_slot)
+    for i in range(3):
+        s = slots[i]
+        t = tokens[s] + (now - stamps[s]) * rates[i]
+        tokens[s] = t if t < caps[i] else caps[i]
+        stamps[s] = now
+    for i in range(3):
+        if tokens[slots[i]] < 1.0:
+            return i
+    for i in range(3):
+        tokens[slots[i]] -= 1.0
+    return -1
+
+
+class TokenBuckets:
+    """
+    Fixed-capacity token buckets stored as parallel arrays; keys map to
+    array slots through an LRU so the least recently used slot is reused
+    """
+    __slots__ = ("slots", "tokens", "stamps")
+    
+    def __init__(self, capacity: int):
+        self.slots = OrderedDict()  # key -> slot
+        self.tokens = np.zeros(capacity, dtype=np.float64)
+        self.stamps = np.zeros(capacity, dtype=np.float64)
+    
+    def slot(self, key, full: float, timestamp: float) -> int:
+        """Slot for key, starting a full bucket if the key is new"""
+        slots = self.slots
+        idx = slots.get(key)
+        if idx is not None:
+            slots.move_to_end(key)
+            return idx
+        if len(slots) < len(self.tokens):
+            idx = len(slots)
+        else:
+            _, idx = slots.popitem(last=False)
+        slots[key] = idx
+        self.tokens[idx] = full
+        self.stamps[idx] = timestamp
+        return idx
+    
+    def refill(self, keys, full: float, rate: float, timestamp: float):
+        """Top up the existing buckets for keys in one vectorized pass"""
+        get = self.slots.get
+        idx = np.fromiter((i for i in map(get, keys) if i is not None), dtype=np.intp)
+        if idx.size:
+            tokens = self.tokens
+            tokens[idx] = np.minimum(full, tokens[idx] + (timestamp - self.stamps[idx]) * rate)
+            self.stamps[idx] = timestamp
+
+
+class RequestCounter:
+    """Per-second request counts over a trailing window of fixed width"""
+    __slots__ = ("buckets", "head", "total")
+    
+    def __init__(self, size: int = BUCKET_SECONDS):
+        self.buckets = [0] * size
+        self.head = 0   # Most recent second written
+        self.total = 0  # Requests recorded over the counter's lifetime
+    
+    def add(self, timestamp: float):
+        """Count one request at timestamp"""
+        buckets = self.buckets
+        size = len(buckets)
+        sec = int(timestamp)
+        gap = sec - self.head
+        if gap >= size:
+            buckets[:] = [0] * size
+            self.head = sec
+        elif gap > 0:
+            for s in range(self.head + 1, sec + 1):
+                buckets[s % size] = 0
+            self.head = sec
+        elif gap <= -size:
+            # Older than anything the window still holds
+            self.total += 1
+            return
+        buckets[sec % size] += 1
+        self.total += 1
+    
+    def count(self, timestamp: float, window: int) -> int:
+        """Requests in the `window` seconds ending at timestamp"""
+        buckets = self.buckets
+        size = len(buckets)
+        sec = int(timestamp)
+        lo = max(sec - min(window, size) + 1, self.head - size + 1)
+        hi = min(sec, self.head)
+        return sum(buckets[s % size] for s in range(lo, hi + 1))
+
+
+@dataclass(slots=True)
 class RateLimit:
     """Rate limit configuration"""
     requests: int  # Number of requests
@@ -29,7 +184,7 @@ class RateLimit:
     penalty: int   # Penalty duration in seconds
 
 
-@dataclass
+@dataclass(slots=True)
 class BlockedIP:
     """Blocked IP information"""
     ip: str
@@ -40,7 +195,7 @@ class BlockedIP:
     auto_expires: bool = True
 
 
-@dataclass
+@dataclass(slots=True)
 class ConnectionInfo:
     """Connection tracking information"""
     ip: str
@@ -53,6 +208,86 @@ class ConnectionInfo:
     penalty_level: int = 0
 
 
+class ConnectionTable:
+    """
+    Per-IP connection counters stored as parallel arrays (one slot per IP key)
+    so idle sweeps run as a single vectorized comparison. Outstanding
+    challenges are rare and live in a plain dict.
+    """
+    
+    def __init__(self, capacity: int):
+        self.slots = OrderedDict()  # ip key -> slot, least recently seen first
+        self.slot_keys: List[Any] = [None] * capacity
+        self.free: List[int] = list(range(capacity - 1, -1, -1))
+        self.first_request = np.zeros(capacity, dtype=np.float64)
+        self.last_request = np.zeros(capacity, dtype=np.float64)
+        self.request_count = np.zeros(capacity, dtype=np.int64)
+        self.failed_attempts = np.zeros(capacity, dtype=np.int32)
+        self.penalty_level = np.zeros(capacity, dtype=np.int8)
+        self.challenges: Dict[Any, str] = {}  # ip key -> challenge token
+    
+    def __len__(self) -> int:
+        return len(self.slots)
+    
+    def __contains__(self, key) -> bool:
+        return key in self.slots
+    
+    def get(self, key) -> Optional[int]:
+        """Slot for key, or None if untracked"""
+        return self.slots.get(key)
+    
+    def touch(self, key, timestamp: float) -> int:
+        """Slot for key, recording a request at timestamp and creating the entry if needed"""
+        slots = self.slots
+        idx = slots.get(key)
+        if idx is None:
+            if not self.free:
+                self._release(slots.popitem(last=False))
+            idx = slots[key] = self.free.pop()
+            self.slot_keys[idx] = key
+            self.first_request[idx] = timestamp
+            self.request_count[idx] = 0
+            self.failed_attempts[idx] = 0
+            self.penalty_level[idx] = 0
+        else:
+            slots.move_to_end(key)
+        self.last_request[idx] = timestamp
+        self.request_count[idx] += 1
+        return idx
+    
+    def evict_idle(self, cutoff: float):
+        """Drop every connection whose last request is older than cutoff"""
+        used = np.zeros(len(self.last_request), dtype=bool)
+        used[list(self.slots.values())] = True
+        for idx in np.flatnonzero(used & (self.last_request < cutoff)):
+            key = self.slot_keys[idx]
+            del self.slots[key]
+            self._release((key, int(idx)))
+    
+    def info(self, key, ip: str) -> Optional[ConnectionInfo]:
+        """Snapshot of the tracked state for key, labelled with ip"""
+        idx = self.slots.get(key)
+        if idx is None:
+            return None
+        token = self.challenges.get(key)
+        return ConnectionInfo(
+            ip=ip,
+            first_request=float(self.first_request[idx]),
+            last_request=float(self.last_request[idx]),
+            request_count=int(self.request_count[idx]),
+            failed_attempts=int(self.failed_attempts[idx]),
+            challenge_required=token is not None,
+            challenge_token=token,
+            penalty_level=int(self.penalty_level[idx])
+        )
+    
+    def _release(self, entry: Tuple[Any, int]):
+        key, idx = entry
+        self.slot_keys[idx] = None
+        self.challenges.pop(key, None)
+        self.free.append(idx)
+
+
 class FloodProtection:
     """
     Advanced flood protection system
@@ -71,10 +306,15 @@ class FloodProtection:
         }
         
         # Tracking
-        self.request_history = defaultdict(lambda: deque(maxlen=1000))
-        self.connections = {}  # ip -> ConnectionInfo
-        self.blocked_ips = {}  # ip -> BlockedIP
-        self.failed_logins = defaultdict(lambda: deque(maxlen=100))
+        # Bounded LRUs so idle sources cannot grow state without limit
+        self.global_history = RequestCounter()
+        self.request_history = OrderedDict()  # ip key -> RequestCounter
+        self.token_buckets = TokenBuckets(TRACKING_CAPACITY)
+        self.connections = ConnectionTable(TRACKING_CAPACITY)
+        self.blocked_ips = {}  # ip key -> BlockedIP
+        self._expiry_heap = []  # (expires_at, ip) for auto-expiring blocks; may hold stale entries
+        self._next_cleanup_at = 0.0
+        self.failed_logins = defaultdict(lambda: deque(maxlen=100))  # ip key -> attempts
         
         # Statistics
         self.stats = {
@@ -86,6 +326,13 @@ class FloodProtection:
             "ips_blocked": 0
         }
         
+        # Bucket sizes and refill rates in the order _take_tokens expects
+        limits = [self.rate_limits[name] for name in ("global", "per_ip", "per_endpoint")]
+        self._bucket_caps = np.array([float(l.requests) for l in limits])
+        self._bucket_rates = np.array([l.requests / l.window for l in limits])
+        if _NUMBA_AVAILABLE:
+            _take_tokens(np.ones(3), np.zeros(3), self._bucket_caps, self._bucket_rates, 0, 1, 2, 0.0)  # JIT warmup
+        
         # Adaptive thresholds
         self.baseline_rps = 10.0  # Requests per second baseline
         self.learning = True
@@ -95,20 +342,53 @@ class FloodProtection:
         Check if request should be allowed
         Returns: (allowed, response_data)
         """
-        self.stats["total_requests"] += 1
-        
         ip = request_data.get("ip", "unknown")
-        endpoint = request_data.get("endpoint", "/")
+        return self._check(request_data, ip, _ip_key(ip), time.time())
+    
+    def check_batch(self, requests: List[Dict[str, Any]]) -> List[Tuple[bool, Dict[str, Any]]]:
+        """
+        Check a batch of concurrent requests against one shared timestamp
+        Token buckets for every source in the batch are refilled in one
+        vectorized pass; the policy checks then run per request in order
+        Returns: list of (allowed, response_data) in input order
+        """
         timestamp = time.time()
+        ips = [request_data.get("ip", "unknown") for request_data in requests]
+        keys = [_ip_key(ip) for ip in ips]
+        
+        buckets = self.token_buckets
+        caps = self._bucket_caps
+        rates = self._bucket_rates
+        buckets.refill(("global",), caps[0], rates[0], timestamp)
+        buckets.refill(dict.fromkeys(keys), caps[1], rates[1], timestamp)
+        buckets.refill(
+            dict.fromkeys((key, r.get("endpoint", "/")) for key, r in zip(keys, requests)),
+            caps[2], rates[2], timestamp
+        )
+        
+        return [
+            self._check(request_data, ip, key, timestamp)
+            for request_data, ip, key in zip(requests, ips, keys)
+        ]
+    
+    def _check(self, request_data: Dict[str, Any], ip: str, key, timestamp: float) -> Tuple[bool, Dict[str, Any]]:
+        """Shared single-request check path"""
+        stats = self.stats
+        connections = self.connections
+        stats["total_requests"] += 1
+        
+        endpoint = request_data.get("endpoint", "/")
         
-        # Clean up expired blocks
-        self._cleanup_expired_blocks()
+        # Clean up expired blocks; the expiry check below covers the gaps
+        if timestamp >= self._next_cleanup_at:
+            self._cleanup_expired_blocks(timestamp)
+            connections.evict_idle(timestamp - IDLE_TIMEOUT)
         
         # Check if IP is blocked
-        if ip in self.blocked_ips:
-            block_info = self.blocked_ips[ip]
+        block_info = self.blocked_ips.get(key)
+        if block_info is not None:
             if timestamp < block_info.expires_at:
-                self.stats["blocked_requests"] += 1
+                stats["blocked_requests"] += 1
                 return False, {
                     "blocked": True,
                     "reason": block_info.reason,
@@ -117,21 +397,14 @@ class FloodProtection:
                 }
         
         # Get or create connection info
-        if ip not in self.connections:
-            self.connections[ip] = ConnectionInfo(
-                ip=ip,
-                first_request=timestamp,
-                last_request=timestamp
-            )
-        
-        conn = self.connections[ip]
-        conn.last_request = timestamp
-        conn.request_count += 1
+        slot = connections.touch(key, timestamp)
+        penalties = connections.penalty_level
         
         # Check if challenge is required
-        if conn.challenge_required:
+        challenge_token = connections.challenges.get(key)
+        if challenge_token is not None:
             challenge_response = request_data.get("challenge_response")
-            if not challenge_response or challenge_response != conn.challenge_token:
+            if not challenge_response or challenge_response != challenge_token:
                 return False, {
                     "challenge_required": True,
                     "message": "Complete challenge to continue",
@@ -139,14 +412,14 @@ class FloodProtection:
                 }
             else:
                 # Challenge passed
-                conn.challenge_required = False
-                conn.challenge_token = None
-                conn.penalty_level = max(0, conn.penalty_level - 1)
+                del connections.challenges[key]
+                penalties[slot] = max(0, penalties[slot] - 1)
         
         # Apply penalty delay if needed
-        if conn.penalty_level > 0:
-            penalty_delay = 2 ** conn.penalty_level  # Exponential backoff
-            if timestamp - conn.last_request < penalty_delay:
+        penalty_level = int(penalties[slot])
+        if penalty_level > 0:
+            penalty_delay = _BACKOFF[penalty_level]  # Exponential backoff
+            if timestamp - connections.last_request[slot] < penalty_delay:
                 return False, {
                     "rate_limited": True,
                     "retry_after": int(penalty_delay),
@@ -154,14 +427,17 @@ class FloodProtection:
                 }
         
         # Check rate limits
-        rate_check = self._check_rate_limits(ip, endpoint, timestamp)
+        rate_check = self._check_rate_limits(key, endpoint, timestamp)
         if not rate_check["allowed"]:
             self._apply_penalty(ip, rate_check["violation"])
             return False, rate_check
         
         # Check for DoS/DDoS patterns
-        dos_check = self._check_dos_patterns(ip, timestamp)
+        # Only allowed requests count against the buckets, so later
+        # rejections hand back the tokens the rate check just spent
+        dos_check = self._check_dos_patterns(key, timestamp)
         if dos_check["is_attack"]:
+            self._refund_tokens(key, endpoint)
             self._block_ip(ip, dos_check["attack_type"], duration=3600)
             return False, {
                 "blocked": True,
@@ -171,25 +447,27 @@ class FloodProtection:
         
         # Check for brute force on login endpoints
         if self._is_auth_endpoint(endpoint):
-            brute_check = self._check_brute_force(ip, endpoint)
+            brute_check = self._check_brute_force(key, endpoint)
             if not brute_check["allowed"]:
+                self._refund_tokens(key, endpoint)
                 return False, brute_check
         
         # Request allowed
-        self._record_request(ip, endpoint, timestamp)
+        self._record_request(key, timestamp)
         return True, {"allowed": True}
     
     def report_failed_auth(self, ip: str, endpoint: str):
         """Report a failed authentication attempt"""
         timestamp = time.time()
-        self.failed_logins[ip].append({
+        key = _ip_key(ip)
+        self.failed_logins[key].append({
             "endpoint": endpoint,
             "timestamp": timestamp
         })
         
         # Check for brute force
         recent_failures = [
-            f for f in self.failed_logins[ip]
+            f for f in self.failed_logins[key]
             if timestamp - f["timestamp"] < 300  # Last 5 minutes
         ]
         
@@ -198,17 +476,20 @@ class FloodProtection:
             self.stats["brute_force_blocked"] += 1
             self._block_ip(ip, "brute_force_auth", duration=3600)
             
-            if ip in self.connections:
-                self.connections[ip].failed_attempts += 1
+            slot = self.connections.get(key)
+            if slot is not None:
+                self.connections.failed_attempts[slot] += 1
     
     def report_successful_auth(self, ip: str):
         """Report successful authentication (resets counters)"""
-        if ip in self.failed_logins:
-            self.failed_logins[ip].clear()
-        
-        if ip in self.connections:
-            self.connections[ip].failed_attempts = 0
-            self.connections[ip].penalty_level = 0
+        key = _ip_key(ip)
+        if key in self.failed_logins:
+            self.failed_logins[key].clear()
+        
+        slot = self.connections.get(key)
+        if slot is not None:
+            self.connections.failed_attempts[slot] = 0
+            self.connections.penalty_level[slot] = 0
     
     def manually_block_ip(self, ip: str, reason: str, duration: int = 86400):
         """Manually block an IP address"""
@@ -216,8 +497,7 @@ class FloodProtection:
     
     def unblock_ip(self, ip: str):
         """Manually unblock an IP address"""
-        if ip in self.blocked_ips:
-            del self.blocked_ips[ip]
+        self.blocked_ips.pop(_ip_key(ip), None)
     
     def get_blocked_ips(self) -> List[BlockedIP]:
         """Get all currently blocked IPs"""
@@ -230,11 +510,7 @@ class FloodProtection:
         
         # Calculate current RPS
         now = time.time()
-        recent_requests = sum(
-            1 for history in self.request_history.values()
-            for ts in history
-            if now - ts < 60
-        )
+        recent_requests = self.global_history.count(now, 60)
         current_rps = recent_requests / 60.0
         
         return {
@@ -247,18 +523,23 @@ class FloodProtection:
     
     def get_connection_info(self, ip: str) -> Optional[ConnectionInfo]:
         """Get connection info for an IP"""
-        return self.connections.get(ip)
+        return self.connections.info(_ip_key(ip), ip)
     
     # ==================== Private Methods ====================
     
-    def _check_rate_limits(self, ip: str, endpoint: str, timestamp: float) -> Dict[str, Any]:
+    def _check_rate_limits(self, key, endpoint: str, timestamp: float) -> Dict[str, Any]:
         """Check all rate limits"""
+        buckets = self.token_buckets
+        caps = self._bucket_caps
+        exhausted = _take_tokens(
+            buckets.tokens, buckets.stamps, caps, self._bucket_rates,
+            buckets.slot("global", caps[0], timestamp),
+            buckets.slot(key, caps[1], timestamp),
+            buckets.slot((key, endpoint), caps[2], timestamp),
+            timestamp
+        )
         
-        # Global rate limit
-        global_history = self.request_history["global"]
-        recent_global = sum(1 for ts in global_history if timestamp - ts < self.rate_limits["global"].window)
-        
-        if recent_global >= self.rate_limits["global"].requests:
+        if exhausted == 0:
             return {
                 "allowed": False,
                 "violation": "global_rate_limit",
@@ -266,11 +547,7 @@ class FloodProtection:
                 "retry_after": self.rate_limits["global"].penalty
             }
         
-        # Per-IP rate limit
-        ip_history = self.request_history[f"ip:{ip}"]
-        recent_ip = sum(1 for ts in ip_history if timestamp - ts < self.rate_limits["per_ip"].window)
-        
-        if recent_ip >= self.rate_limits["per_ip"].requests:
+        if exhausted == 1:
             return {
                 "allowed": False,
                 "violation": "ip_rate_limit",
@@ -278,12 +555,7 @@ class FloodProtection:
                 "retry_after": self.rate_limits["per_ip"].penalty
             }
         
-        # Per-endpoint rate limit
-        endpoint_key = f"endpoint:{ip}:{endpoint}"
-        endpoint_history = self.request_history[endpoint_key]
-        recent_endpoint = sum(1 for ts in endpoint_history if timestamp - ts < self.rate_limits["per_endpoint"].window)
-        
-        if recent_endpoint >= self.rate_limits["per_endpoint"].requests:
+        if exhausted == 2:
             return {
                 "allowed": False,
                 "violation": "endpoint_rate_limit",
@@ -293,17 +565,39 @@ class FloodProtection:
         
         return {"allowed": True}
     
-    def _check_dos_patterns(self, ip: str, timestamp: float) -> Dict[str, Any]:
+    def _refund_tokens(self, key, endpoint: str):
+        """Return the global, per-IP and per-endpoint tokens spent by a rejected request"""
+        buckets = self.token_buckets
+        slots = buckets.slots
+        tokens = buckets.tokens
+        for bucket_key, cap in zip(("global", key, (key, endpoint)), self._bucket_caps):
+            idx = slots.get(bucket_key)
+            if idx is not None:
+                tokens[idx] = min(cap, tokens[idx] + 1.0)
+    
+    def _counter(self, key) -> RequestCounter:
+        """Get or create the request counter for an IP key, refreshing its LRU position"""
+        history = self.request_history
+        counter = history.get(key)
+        if counter is None:
+            counter = history[key] = RequestCounter()
+            if len(history) > TRACKING_CAPACITY:
+                history.popitem(last=False)
+        else:
+            history.move_to_end(key)
+        return counter
+    
+    def _check_dos_patterns(self, key, timestamp: float) -> Dict[str, Any]:
         """Check for DoS/DDoS attack patterns"""
         
         # Get request history for this IP
-        ip_history = self.request_history[f"ip:{ip}"]
+        ip_history = self._counter(key)
         
-        if len(ip_history) < 10:
+        if ip_history.total < 10:
             return {"is_attack": False}
         
         # Calculate requests in last 10 seconds
-        recent_10s = sum(1 for ts in ip_history if timestamp - ts < 10)
+        recent_10s = ip_history.count(timestamp, 10)
         
         # Check for DoS (single source flooding)
         if recent_10s > 50:  # More than 50 requests in 10 seconds
@@ -315,18 +609,17 @@ class FloodProtection:
             }
         
         # Check for distributed attack patterns
-        global_history = self.request_history["global"]
-        global_recent = sum(1 for ts in global_history if timestamp - ts < 10)
+        global_history = self.global_history
+        global_recent = global_history.count(timestamp, 10)
         
         # If global traffic is way above baseline
         if global_recent > self.baseline_rps * 10 * 10:  # 10x baseline for 10 seconds
             # Check how many unique IPs
             unique_ips = set()
-            for key, history in self.request_history.items():
-                if key.startswith("ip:"):
-                    recent = sum(1 for ts in history if timestamp - ts < 10)
-                    if recent > 5:
-                        unique_ips.add(key)
+            for source, counter in self.request_history.items():
+                recent = counter.count(timestamp, 10)
+                if recent > 5:
+                    unique_ips.add(source)
             
             # DDoS if many sources
             if len(unique_ips) > 10:
@@ -339,21 +632,19 @@ class FloodProtection:
         
         return {"is_attack": False}
     
-    def _check_brute_force(self, ip: str, endpoint: str) -> Dict[str, Any]:
+    def _check_brute_force(self, key, endpoint: str) -> Dict[str, Any]:
         """Check for brute force attacks on authentication endpoints"""
         
         recent_failures = [
-            f for f in self.failed_logins[ip]
+            f for f in self.failed_logins[key]
             if time.time() - f["timestamp"] < 300
         ]
         
         if len(recent_failures) >= 3:
             # Require challenge after 3 failures
-            if ip in self.connections:
-                conn = self.connections[ip]
-                if not conn.challenge_required:
-                    conn.challenge_required = True
-                    conn.challenge_token = secrets.token_urlsafe(16)
+            challenges = self.connections.challenges
+            if key in self.connections and key not in challenges:
+                challenges[key] = secrets.token_urlsafe(16)
             
             return {
                 "allowed": False,
@@ -366,32 +657,36 @@ class FloodProtection:
     
     def _apply_penalty(self, ip: str, violation: str):
         """Apply progressive penalty to an IP"""
-        if ip in self.connections:
-            conn = self.connections[ip]
-            conn.penalty_level += 1
+        connections = self.connections
+        key = _ip_key(ip)
+        slot = connections.get(key)
+        if slot is not None:
+            penalty_level = min(int(connections.penalty_level[slot]) + 1, MAX_PENALTY_LEVEL)
+            connections.penalty_level[slot] = penalty_level
             
             # After 3 violations, require challenge
-            if conn.penalty_level >= 3:
-                conn.challenge_required = True
-                conn.challenge_token = secrets.token_urlsafe(16)
+            if penalty_level >= 3:
+                connections.challenges[key] = secrets.token_urlsafe(16)
             
             # After 5 violations, block temporarily
-            if conn.penalty_level >= 5:
-                duration = 2 ** conn.penalty_level  # Exponential
+            if penalty_level >= 5:
+                duration = _BACKOFF[penalty_level]  # Exponential
                 self._block_ip(ip, f"repeated_{violation}", duration)
     
     def _block_ip(self, ip: str, reason: str, duration: int, auto_expires: bool = True):
         """Block an IP address"""
         timestamp = time.time()
+        key = _ip_key(ip)
         
-        if ip in self.blocked_ips:
+        existing = self.blocked_ips.get(key)
+        if existing is not None:
             # Increase block duration for repeat offenders
-            existing = self.blocked_ips[ip]
             existing.block_count += 1
             existing.expires_at = timestamp + (duration * existing.block_count)
             existing.reason = f"{reason} (x{existing.block_count})"
+            block = existing
         else:
-            self.blocked_ips[ip] = BlockedIP(
+            block = self.blocked_ips[key] = BlockedIP(
                 ip=ip,
                 reason=reason,
                 blocked_at=timestamp,
@@ -399,30 +694,44 @@ class FloodProtection:
                 auto_expires=auto_expires
             )
             self.stats["ips_blocked"] += 1
+        
+        if block.auto_expires:
+            heapq.heappush(self._expiry_heap, (block.expires_at, ip))
     
-    def _cleanup_expired_blocks(self):
+    def _cleanup_expired_blocks(self, timestamp: Optional[float] = None):
         """Remove expired IP blocks"""
-        timestamp = time.time()
-        expired = [
-            ip for ip, block in self.blocked_ips.items()
-            if block.auto_expires and timestamp >= block.expires_at
-        ]
-        
-        for ip in expired:
-            del self.blocked_ips[ip]
+        if timestamp is None:
+            timestamp = time.time()
+        self._next_cleanup_at = timestamp + CLEANUP_INTERVAL
+        
+        # Pop only what has expired; entries for blocks that were since
+        # extended or lifted no longer match the live block and are skipped
+        heap = self._expiry_heap
+        blocked = self.blocked_ips
+        while heap and heap[0][0] <= timestamp:
+            _, ip = heapq.heappop(heap)
+            key = _ip_key(ip)
+            block = blocked.get(key)
+            if block is not None and block.auto_expires and block.expires_at <= timestamp:
+                del blocked[key]
+        
+        # Re-blocks and unblocks leave stale entries behind; rebuild the heap
+        # from live blocks in one pass once they outnumber the real ones
+        if len(heap) > 2 * len(blocked) + 64:
+            heap[:] = [(b.expires_at, b.ip) for b in blocked.values() if b.auto_expires]
+            heapq.heapify(heap)
     
-    def _record_request(self, ip: str, endpoint: str, timestamp: float):
+    def _record_request(self, key, timestamp: float):
         """Record a request in history"""
-        self.request_history["global"].append(timestamp)
-        self.request_history[f"ip:{ip}"].append(timestamp)
-        self.request_history[f"endpoint:{ip}:{endpoint}"].append(timestamp)
+        self.global_history.add(timestamp)
+        self._counter(key).add(timestamp)
         
         # Update baseline (simple moving average)
         if self.learning:
-            global_history = self.request_history["global"]
-            if len(global_history) > 100:
+            global_history = self.global_history
+            if global_history.total > 100:
                 recent_window = 60  # 1 minute
-                recent_count = sum(1 for ts in global_history if timestamp - ts < recent_window)
+                recent_count = global_history.count(timestamp, recent_window)
                 rps = recent_count / recent_window
                 
                 # Update baseline with exponential moving average
@@ -431,22 +740,17 @@ class FloodProtection:
     
     def _is_auth_endpoint(self, endpoint: str) -> bool:
         """Check if endpoint is authentication-related"""
-        auth_patterns = [
-            "/login", "/auth", "/signin", "/api/auth",
-            "/oauth", "/token", "/session"
-        ]
-        return any(pattern in endpoint.lower() for pattern in auth_patterns)
+        return _AUTH_RE.search(endpoint) is not None
     
     def _generate_challenge(self) -> Dict[str, Any]:
         """Generate a simple challenge for suspected bots"""
         # In production, this could be a CAPTCHA, proof-of-work, etc.
-        a = secrets.randbelow(10)
-        b = secrets.randbelow(10)
+        question, expected = _challenge_rng.choice(_MATH_CHALLENGES)
         
         return {
             "type": "math",
-            "question": f"What is {a} + {b}?",
-            "expected": str(a + b)
+            "question": question,
+            "expected": expected
         }
 
 
@@ -13,13 +13,121 @@ commonly used by attackers for:
 This module detects and blocks these attack patterns.
 """
 import re
+import sys
 import time
 import hashlib
+import logging
+from bisect import bisect_right
+from itertools import accumulate
 from typing import Dict, Any, List, Optional, Tuple, Set
 from dataclasses import dataclass, field
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
+from functools import partial
 from datetime import datetime, timedelta
 
+try:
+    import hyperscan
+    _HYPERSCAN_AVAILABLE = True
+except ImportError:
+    _HYPERSCAN_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+
+# Event fields that can carry attack indicators; only these are scanned
+_SCAN_FIELDS = (
+    "command", "path", "share", "service_principal", "ldap_filter", "interface_uuid",
+    "operation", "auth_type", "ticket_type", "encryption_type", "username"
+)
+
+# Bit flags for indicator tokens present in an event, set once when it is recorded
+FLAG_ADMIN_SHARE = 1 << 0
+FLAG_SERVICE = 1 << 1
+FLAG_PIPE = 1 << 2
+FLAG_REGISTRY = 1 << 3
+FLAG_NTDS = 1 << 4
+FLAG_SPN = 1 << 5
+FLAG_SMB = 1 << 6
+
+_TOKEN_FLAGS = (
+    ("ADMIN$", FLAG_ADMIN_SHARE),
+    ("SERVICE", FLAG_SERVICE),
+    ("PIPE", FLAG_PIPE),
+    ("REGISTRY", FLAG_REGISTRY),
+    ("WINREG", FLAG_REGISTRY),
+    ("NTDS", FLAG_NTDS),
+    ("SAM", FLAG_NTDS),
+    ("SPN", FLAG_SPN),
+)
+
+# Attack chains as the flags every stage must contribute
+_PSEXEC_CHAIN = FLAG_ADMIN_SHARE | FLAG_SERVICE | FLAG_PIPE
+_SECRETSDUMP_CHAIN = FLAG_SMB | FLAG_REGISTRY | FLAG_NTDS
+
+# Longest look-back of any detector; older events are trimmed before analysis
+MAX_EVENT_WINDOW = 300
+AUTH_WINDOW = 60  # Look-back of the authentication anomaly checks
+TRACKING_CAPACITY = 100000  # IPs kept per tracking table before LRU eviction
+
+
+def _scan_string(event_data: Dict[str, Any]) -> str:
+    """Indicator-bearing fields of an event joined into one searchable string"""
+    return "\x00".join([str(event_data.get(key, "")) for key in _SCAN_FIELDS])
+
+
+def _touch(table: OrderedDict, key, factory, is_idle):
+    """
+    Get or create table[key] as the most recently used entry. Entries are
+    kept in order of last use, so idle ones are dropped from the front, and
+    the least recently used beyond TRACKING_CAPACITY are evicted.
+    """
+    value = table.get(key)
+    if value is None:
+        value = table[key] = factory()
+        if len(table) > TRACKING_CAPACITY:
+            table.popitem(last=False)
+    else:
+        table.move_to_end(key)
+    while True:
+        oldest = next(iter(table))
+        if oldest == key or not is_idle(table[oldest]):
+            return value
+        del table[oldest]
+
+
+def _recent(events, cutoff: float):
+    """Newest-first events stamped after cutoff; events are stored in time order"""
+    for event in reversed(events):
+        if event.timestamp <= cutoff:
+            return
+        yield event
+
+
+_new_event_deque = partial(deque, maxlen=1000)
+_new_auth_deque = partial(deque, maxlen=100)
+_new_user_auth_deque = partial(deque, maxlen=200)
+
+
+# SMB indicators: exact admin shares, and substrings of service commands and pipe names
+_ADMIN_SHARES = frozenset({"ADMIN$", "C$", "IPC$"})
+_SERVICE_COMMAND_RE = re.compile(r"SVCCTL|SCMR|SERVICE")
+_SUSPICIOUS_PIPE_RE = re.compile(r"PSEXESVC|REMCOMSVC|WINREG|SAMR|LSARPC")
+
+# Suspicious RPC interfaces as (lowercased needle, display name, attack type)
+_SUSPICIOUS_INTERFACES = tuple(
+    (iface.lower(), iface, attack) for iface, attack in (
+        ("ITaskSchedulerService", "scheduled_task_exec"),
+        ("IRemUnknown2", "dcom_exec"),
+        ("DCOM", "dcom_exec"),
+        ("SVCCTL", "service_exec"),
+    )
+)
+
+# LDAP filter injection: combined AND/OR, wildcard tricks, admin wildcards,
+# parenthesis manipulation
+_LDAP_INJECTION_RE = re.compile(r"\(\&[^\n]{0,256}?\(\||\*\)\(|admin\*|\)\)\(", re.IGNORECASE)
+
 
 @dataclass
 class ImpacketSignature:
@@ -30,6 +138,7 @@ class ImpacketSignature:
     severity: int  # 1-10
     description: str
     indicators: List[str] = field(default_factory=list)
+    compiled: Optional[re.Pattern] = field(default=None, repr=False, compare=False)
 
 
 @dataclass
@@ -41,6 +150,16 @@ class NetworkEvent:
     protocol: str
     details: Dict[str, Any]
     matched_signatures: List[str] = field(default_factory=list)
+    flags: int = 0  # FLAG_* indicator bits
+
+
+@dataclass(slots=True)
+class ProtocolAnalysis:
+    """Result of a protocol-specific analyzer, merged into the event analysis"""
+    suspicious: bool = False
+    attack_type: Optional[str] = None
+    confidence: float = 0.0
+    indicators: List[str] = field(default_factory=list)
 
 
 class ImpacketProtection:
@@ -61,9 +180,40 @@ class ImpacketProtection:
         # Initialize attack signatures
         self.signatures = self._initialize_signatures()
         
+        # All signatures fused into one alternation; a single scan rules out
+        # the common no-match case before any per-signature search. Signatures
+        # match the encoded scan fields, where re runs faster than on str
+        self._signature_prefilter = re.compile(
+            "|".join(f"(?:{sig.pattern})" for sig in self.signatures.values()).lower().encode()
+        )
+        
+        # With hyperscan every signature is matched in one block-mode scan,
+        # replacing both the prefilter and the per-signature searches
+        self._sig_ids = list(self.signatures)
+        self._hs_db = None
+        if _HYPERSCAN_AVAILABLE:
+            self._hs_db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+            self._hs_db.compile(
+                expressions=[sig.pattern.encode() for sig in self.signatures.values()],
+                ids=list(range(len(self._sig_ids))),
+                elements=len(self._sig_ids),
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(self._sig_ids)
+            )
+        
+        # Protocol-specific analyzers, keyed by upper-cased protocol name
+        self._proto_handlers = {
+            "SMB": self._analyze_smb_traffic,
+            "KERBEROS": self._analyze_kerberos_traffic,
+            "LDAP": self._analyze_ldap_traffic,
+            "RPC": self._analyze_rpc_traffic,
+            "DCERPC": self._analyze_rpc_traffic
+        }
+        
         # Event tracking
-        self.network_events = defaultdict(lambda: deque(maxlen=1000))
-        self.auth_attempts = defaultdict(lambda: deque(maxlen=100))
+        # Per-IP tables are LRU-ordered; IPs idle past their look-back are dropped
+        self.network_events: OrderedDict = OrderedDict()
+        self.auth_attempts: OrderedDict = OrderedDict()
+        self._auth_by_user: OrderedDict = OrderedDict()  # username -> (ip, timestamp), same LRU as per-IP tables
         self.smb_sessions = {}
         self.kerberos_tickets = {}
         self.suspicious_ips = set()
@@ -90,11 +240,53 @@ class ImpacketProtection:
         Analyze network event for Impacket attack patterns
         Returns: (is_attack, analysis_result)
         """
+        search_string = _scan_string(event_data)
+        scan_bytes = search_string.encode("utf-8", "replace").lower()
+        if self._hs_db is not None:
+            return self._analyze(event_data, time.time(), search_string, scan_bytes, 0)
+        first = self._signature_prefilter.search(scan_bytes)
+        return self._analyze(event_data, time.time(), search_string, scan_bytes, first and first.start())
+    
+    def analyze_batch(self, events: List[Dict[str, Any]]) -> List[Tuple[bool, Dict[str, Any]]]:
+        """
+        Analyze a batch of network events, e.g. an offline capture replay
+        The signature prefilter makes one scan over the whole batch; the
+        stateful detectors then run per event in order
+        Returns: list of (is_attack, analysis_result) in input order
+        """
+        timestamp = time.time()
+        search_strings = [_scan_string(event_data) for event_data in events]
+        scan_bytes = [search_string.encode("utf-8", "replace").lower() for search_string in search_strings]
+        
+        first_hits: List[Optional[int]] = [None] * len(events)
+        if self._hs_db is not None:
+            first_hits = [0] * len(events)  # Each event gets its own hyperscan pass
+        else:
+            # Events are newline-separated and no signature matches a newline,
+            # so every hit falls inside one event; ends[i] is where event i+1 starts
+            ends = list(accumulate(len(data) + 1 for data in scan_bytes))
+            for match in self._signature_prefilter.finditer(b"\n".join(scan_bytes)):
+                i = bisect_right(ends, match.start())
+                if first_hits[i] is None:
+                    first_hits[i] = match.start() - (ends[i - 1] if i else 0)
+        
+        return [
+            self._analyze(event_data, timestamp, search_string, data, first_hit)
+            for event_data, search_string, data, first_hit in zip(events, search_strings, scan_bytes, first_hits)
+        ]
+    
+    def _analyze(self, event_data: Dict[str, Any], timestamp: float, search_string: str,
+                 scan_bytes: bytes, first_hit: Optional[int]) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Shared single-event analysis path; scan_bytes is search_string encoded
+        and lowercased for the signature scan, and first_hit is where the fused signature
+        pattern first matched it, or None
+        """
         self.stats["total_events"] += 1
         
         ip = event_data.get("source_ip", "unknown")
-        protocol = event_data.get("protocol", "").upper()
-        timestamp = time.time()
+        # Interned so stored events share one copy and compare by identity
+        protocol = sys.intern(event_data.get("protocol", "").upper())
         
         # Check if IP is already blocked
         if ip in self.blocked_ips:
@@ -104,13 +296,29 @@ class ImpacketProtection:
                 "blocked_at": self.blocked_ips[ip]["timestamp"]
             }
         
+        # Trim events that no detector looks back far enough to see
+        cutoff = timestamp - MAX_EVENT_WINDOW
+        events = _touch(
+            self.network_events, ip, _new_event_deque,
+            lambda stale: not stale or stale[-1].timestamp <= cutoff
+        )
+        while events and events[0].timestamp <= cutoff:
+            events.popleft()
+        
+        # Indicator flags from the joined scan fields
+        flags = FLAG_SMB if "SMB" in protocol else 0
+        for token, bit in _TOKEN_FLAGS:
+            if token in search_string:
+                flags |= bit
+        
         # Create network event
         event = NetworkEvent(
             ip=ip,
             timestamp=timestamp,
-            event_type=event_data.get("event_type", "unknown"),
+            event_type=sys.intern(str(event_data.get("event_type", "unknown"))),
             protocol=protocol,
-            details=event_data
+            details=event_data,
+            flags=flags
         )
         
         # Run detection checks
@@ -124,73 +332,57 @@ class ImpacketProtection:
         }
         
         # Check for signature matches
-        signature_matches = self._check_signatures(event_data)
+        signature_matches = self._check_signatures(scan_bytes, first_hit)
         if signature_matches:
             analysis["matched_signatures"] = signature_matches
             analysis["is_attack"] = True
             analysis["confidence"] += 0.4
         
         # Protocol-specific checks
-        if protocol == "SMB":
-            smb_analysis = self._analyze_smb_traffic(ip, event_data)
-            if smb_analysis["suspicious"]:
+        handler = self._proto_handlers.get(protocol)
+        if handler is not None:
+            proto_analysis = handler(ip, event_data, timestamp)
+            if proto_analysis.suspicious:
                 analysis["is_attack"] = True
-                analysis["attack_type"] = smb_analysis["attack_type"]
-                analysis["confidence"] += smb_analysis["confidence"]
-                analysis["indicators"].extend(smb_analysis["indicators"])
+                analysis["attack_type"] = proto_analysis.attack_type
+                analysis["confidence"] += proto_analysis.confidence
+                analysis["indicators"].extend(proto_analysis.indicators)
         
-        elif protocol == "KERBEROS":
-            krb_analysis = self._analyze_kerberos_traffic(ip, event_data)
-            if krb_analysis["suspicious"]:
-                analysis["is_attack"] = True
-                analysis["attack_type"] = krb_analysis["attack_type"]
-                analysis["confidence"] += krb_analysis["confidence"]
-                analysis["indicators"].extend(krb_analysis["indicators"])
+        # Once confidence saturates the event is already an attack at full
+        # confidence, so the remaining checks are skipped
         
-        elif protocol == "LDAP":
-            ldap_analysis = self._analyze_ldap_traffic(ip, event_data)
-            if ldap_analysis["suspicious"]:
+        # Check for NTLM relay patterns; only NTLM authentications can match
+        if analysis["confidence"] < 1.0 and "auth_type" in event_data:
+            ntlm_analysis = self._check_ntlm_relay(ip, event_data, timestamp)
+            if ntlm_analysis["is_relay"]:
                 analysis["is_attack"] = True
-                analysis["attack_type"] = ldap_analysis["attack_type"]
-                analysis["confidence"] += ldap_analysis["confidence"]
-                analysis["indicators"].extend(ldap_analysis["indicators"])
+                analysis["attack_type"] = "ntlm_relay"
+                analysis["confidence"] += 0.3
+                analysis["indicators"].extend(ntlm_analysis["indicators"])
         
-        elif protocol == "RPC" or protocol == "DCERPC":
-            rpc_analysis = self._analyze_rpc_traffic(ip, event_data)
-            if rpc_analysis["suspicious"]:
+        # Check attack chains, built from earlier events of this IP
+        if analysis["confidence"] < 1.0 and events:
+            chain_analysis = self._check_attack_chains(ip, event_data, timestamp)
+            if chain_analysis["chain_detected"]:
                 analysis["is_attack"] = True
-                analysis["attack_type"] = rpc_analysis["attack_type"]
-                analysis["confidence"] += rpc_analysis["confidence"]
-                analysis["indicators"].extend(rpc_analysis["indicators"])
-        
-        # Check for NTLM relay patterns
-        ntlm_analysis = self._check_ntlm_relay(ip, event_data)
-        if ntlm_analysis["is_relay"]:
-            analysis["is_attack"] = True
-            analysis["attack_type"] = "ntlm_relay"
-            analysis["confidence"] += 0.3
-            analysis["indicators"].extend(ntlm_analysis["indicators"])
-        
-        # Check attack chains
-        chain_analysis = self._check_attack_chains(ip, event_data)
-        if chain_analysis["chain_detected"]:
-            analysis["is_attack"] = True
-            analysis["attack_type"] = chain_analysis["chain_type"]
-            analysis["confidence"] += 0.3
-            analysis["indicators"].append(f"Attack chain: {chain_analysis['chain_type']}")
+                analysis["attack_type"] = chain_analysis["chain_type"]
+                analysis["confidence"] += 0.3
+                analysis["indicators"].append(f"Attack chain: {chain_analysis['chain_type']}")
         
-        # Check behavioral anomalies
-        behavior_analysis = self._check_behavioral_anomalies(ip)
-        if behavior_analysis["anomalous"]:
-            analysis["confidence"] += behavior_analysis["confidence_boost"]
-            analysis["indicators"].extend(behavior_analysis["anomalies"])
+        # Check behavioral anomalies; they need auth attempts or more than
+        # three earlier events (protocol switching)
+        if analysis["confidence"] < 1.0 and (self.auth_attempts.get(ip) or len(events) > 3):
+            behavior_analysis = self._check_behavioral_anomalies(ip, timestamp)
+            if behavior_analysis["anomalous"]:
+                analysis["confidence"] += behavior_analysis["confidence_boost"]
+                analysis["indicators"].extend(behavior_analysis["anomalies"])
         
         # Normalize confidence to 0-1
         analysis["confidence"] = min(1.0, analysis["confidence"])
         
         # Store event
         event.matched_signatures = analysis["matched_signatures"]
-        self.network_events[ip].append(event)
+        events.append(event)
         
         # Take action if attack detected with high confidence
         if analysis["is_attack"] and analysis["confidence"] >= 0.7:
@@ -203,13 +395,26 @@ class ImpacketProtection:
     def report_auth_attempt(self, ip: str, auth_data: Dict[str, Any]):
         """Report authentication attempt for tracking"""
         timestamp = time.time()
-        self.auth_attempts[ip].append({
+        cutoff = timestamp - AUTH_WINDOW
+        attempts = _touch(
+            self.auth_attempts, ip, _new_auth_deque,
+            lambda stale: stale[-1]["timestamp"] <= cutoff
+        )
+        attempts.append({
             "timestamp": timestamp,
             "username": auth_data.get("username"),
             "protocol": auth_data.get("protocol"),
             "success": auth_data.get("success", False),
             "auth_type": auth_data.get("auth_type")  # NTLM, Kerberos, etc.
         })
+        
+        # Usernames are attacker-chosen, so the index is bounded like the per-IP tables
+        username = auth_data.get("username")
+        if username:
+            _touch(
+                self._auth_by_user, username, _new_user_auth_deque,
+                lambda stale: stale[-1][1] <= cutoff
+            ).append((ip, timestamp))
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get protection statistics"""
@@ -290,7 +495,7 @@ class ImpacketProtection:
             ),
             "silver_ticket": ImpacketSignature(
                 name="Silver Ticket",
-                pattern=r"(KRB_TGS|service ticket|forged.*ticket)",
+                pattern=r"KRB_TGS|service ticket|forged[^\n]{0,32}?ticket",
                 category="kerberos",
                 severity=9,
                 description="Silver ticket attack (forged service ticket)",
@@ -298,7 +503,7 @@ class ImpacketProtection:
             ),
             "kerberoasting": ImpacketSignature(
                 name="Kerberoasting",
-                pattern=r"(GetUserSPNs|RC4_HMAC|TGS.*REQ.*SPN)",
+                pattern=r"GetUserSPNs|RC4_HMAC|TGS[^\n]{0,16}?REQ[^\n]{0,32}?SPN",
                 category="kerberos",
                 severity=8,
                 description="Kerberoasting attack",
@@ -308,7 +513,7 @@ class ImpacketProtection:
             # NTLM attacks
             "ntlm_relay": ImpacketSignature(
                 name="NTLM Relay",
-                pattern=r"(ntlmrelayx|NTLMSSP|AUTHENTICATE.*relay)",
+                pattern=r"ntlmrelayx|NTLMSSP|AUTHENTICATE[^\n]{0,32}?relay",
                 category="ntlm",
                 severity=9,
                 description="NTLM relay attack",
@@ -316,7 +521,7 @@ class ImpacketProtection:
             ),
             "pass_the_hash": ImpacketSignature(
                 name="Pass-the-Hash",
-                pattern=r"(NTLM hash|LM:NTLM|pass.*hash)",
+                pattern=r"NTLM hash|LM:NTLM|pass[^\n]{0,32}?hash",
                 category="ntlm",
                 severity=9,
                 description="Pass-the-hash attack",
@@ -334,7 +539,7 @@ class ImpacketProtection:
             ),
             "atexec": ImpacketSignature(
                 name="AT Exec",
-                pattern=r"(atsvc|ITaskSchedulerService|scheduled.*task)",
+                pattern=r"atsvc|ITaskSchedulerService|scheduled[^\n]{0,32}?task",
                 category="rpc",
                 severity=8,
                 description="Task Scheduler remote execution",
@@ -352,39 +557,52 @@ class ImpacketProtection:
             )
         }
         
+        # Matching is caseless by lowercasing both sides once instead of using
+        # re.IGNORECASE, so patterns must not rely on uppercase escapes (\S, \W)
+        for signature in signatures.values():
+            signature.compiled = re.compile(signature.pattern.lower().encode())
+        
         return signatures
     
-    def _check_signatures(self, event_data: Dict[str, Any]) -> List[str]:
-        """Check event against known signatures"""
-        matches = []
-        
-        # Convert event data to searchable string
-        search_string = str(event_data).lower()
+    def _check_signatures(self, scan_bytes: bytes, start: Optional[int]) -> List[str]:
+        """
+        Check an event's encoded scan fields against known signatures; start is
+        the earliest hit of the fused prefilter (None when nothing matched),
+        and no signature can match before it
+        """
+        if start is None:
+            return []
+        
+        if self._hs_db is not None:
+            hit_ids = []
+            self._hs_db.scan(
+                scan_bytes,
+                match_event_handler=lambda sig, _from, _to, _flags, _ctx: hit_ids.append(sig)
+            )
+            matches = [self._sig_ids[i] for i in sorted(hit_ids)]
+        else:
+            matches = [
+                sig_id for sig_id, signature in self.signatures.items()
+                if signature.compiled.search(scan_bytes, start)
+            ]
         
-        for sig_id, signature in self.signatures.items():
-            if re.search(signature.pattern, search_string, re.IGNORECASE):
-                matches.append(sig_id)
-                
-                # Update stats
-                if signature.category == "smb":
-                    self.stats["smb_attacks"] += 1
-                elif signature.category == "kerberos":
-                    self.stats["kerberos_attacks"] += 1
-                elif signature.category == "rpc":
-                    self.stats["rpc_exploits"] += 1
-                elif signature.category == "ldap":
-                    self.stats["ldap_attacks"] += 1
+        # Update stats
+        for sig_id in matches:
+            category = self.signatures[sig_id].category
+            if category == "smb":
+                self.stats["smb_attacks"] += 1
+            elif category == "kerberos":
+                self.stats["kerberos_attacks"] += 1
+            elif category == "rpc":
+                self.stats["rpc_exploits"] += 1
+            elif category == "ldap":
+                self.stats["ldap_attacks"] += 1
         
         return matches
     
-    def _analyze_smb_traffic(self, ip: str, event_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _analyze_smb_traffic(self, ip: str, event_data: Dict[str, Any], now: float) -> ProtocolAnalysis:
         """Analyze SMB traffic for attacks"""
-        analysis = {
-            "suspicious": False,
-            "attack_type": None,
-            "confidence": 0.0,
-            "indicators": []
-        }
+        analysis = ProtocolAnalysis()
         
         # Check for common attack indicators
         command = str(event_data.get("command", "")).upper()
@@ -392,53 +610,44 @@ class ImpacketProtection:
         share = str(event_data.get("share", "")).upper()
         
         # Admin share access
-        if share in ["ADMIN$", "C$", "IPC$"]:
-            analysis["suspicious"] = True
-            analysis["indicators"].append(f"Admin share access: {share}")
-            analysis["confidence"] += 0.3
+        if share in _ADMIN_SHARES:
+            analysis.suspicious = True
+            analysis.indicators.append(f"Admin share access: {share}")
+            analysis.confidence += 0.3
         
         # Registry access
         if "WINREG" in path or "REGISTRY" in path:
-            analysis["suspicious"] = True
-            analysis["indicators"].append("Registry access via SMB")
-            analysis["confidence"] += 0.2
+            analysis.suspicious = True
+            analysis.indicators.append("Registry access via SMB")
+            analysis.confidence += 0.2
         
         # Service operations
-        if any(svc in command for svc in ["SVCCTL", "SCMR", "SERVICE"]):
-            analysis["suspicious"] = True
-            analysis["indicators"].append("Service control operations")
-            analysis["attack_type"] = "smb_exec"
-            analysis["confidence"] += 0.3
+        if _SERVICE_COMMAND_RE.search(command):
+            analysis.suspicious = True
+            analysis.indicators.append("Service control operations")
+            analysis.attack_type = "smb_exec"
+            analysis.confidence += 0.3
         
         # Named pipe abuse
         if "\\PIPE\\" in path:
-            pipe_name = path.split("\\PIPE\\")[-1]
-            suspicious_pipes = ["PSEXESVC", "REMCOMSVC", "WINREG", "SAMR", "LSARPC"]
-            if any(p in pipe_name for p in suspicious_pipes):
-                analysis["suspicious"] = True
-                analysis["indicators"].append(f"Suspicious named pipe: {pipe_name}")
-                analysis["confidence"] += 0.3
+            pipe_name = path.rsplit("\\PIPE\\", 1)[-1]
+            if _SUSPICIOUS_PIPE_RE.search(pipe_name):
+                analysis.suspicious = True
+                analysis.indicators.append(f"Suspicious named pipe: {pipe_name}")
+                analysis.confidence += 0.3
         
         # Rapid SMB session creation
-        recent_sessions = [
-            e for e in self.network_events[ip]
-            if e.protocol == "SMB" and time.time() - e.timestamp < 60
-        ]
-        if len(recent_sessions) > 20:
-            analysis["suspicious"] = True
-            analysis["indicators"].append("Rapid SMB session creation")
-            analysis["confidence"] += 0.2
+        recent_sessions = sum(1 for e in _recent(self.network_events[ip], now - 60) if e.protocol == "SMB")
+        if recent_sessions > 20:
+            analysis.suspicious = True
+            analysis.indicators.append("Rapid SMB session creation")
+            analysis.confidence += 0.2
         
         return analysis
     
-    def _analyze_kerberos_traffic(self, ip: str, event_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _analyze_kerberos_traffic(self, ip: str, event_data: Dict[str, Any], now: float) -> ProtocolAnalysis:
         """Analyze Kerberos traffic for attacks"""
-        analysis = {
-            "suspicious": False,
-            "attack_type": None,
-            "confidence": 0.0,
-            "indicators": []
-        }
+        analysis = ProtocolAnalysis()
         
         ticket_type = event_data.get("ticket_type", "")
         encryption = event_data.get("encryption_type", "")
@@ -446,114 +655,82 @@ class ImpacketProtection:
         
         # Check for weak encryption (often used in attacks)
         if "RC4" in encryption or "DES" in encryption:
-            analysis["suspicious"] = True
-            analysis["indicators"].append(f"Weak encryption: {encryption}")
-            analysis["confidence"] += 0.2
+            analysis.suspicious = True
+            analysis.indicators.append(f"Weak encryption: {encryption}")
+            analysis.confidence += 0.2
         
         # Multiple SPN requests (Kerberoasting)
-        recent_spn_requests = [
-            e for e in self.network_events[ip]
-            if "SPN" in str(e.details) and time.time() - e.timestamp < 300
-        ]
-        if len(recent_spn_requests) > 5:
-            analysis["suspicious"] = True
-            analysis["attack_type"] = "kerberoasting"
-            analysis["indicators"].append(f"Multiple SPN requests: {len(recent_spn_requests)}")
-            analysis["confidence"] += 0.4
+        recent_spn_requests = sum(1 for e in _recent(self.network_events[ip], now - 300) if e.flags & FLAG_SPN)
+        if recent_spn_requests > 5:
+            analysis.suspicious = True
+            analysis.attack_type = "kerberoasting"
+            analysis.indicators.append(f"Multiple SPN requests: {recent_spn_requests}")
+            analysis.confidence += 0.4
         
         # Unusual ticket lifetime
         lifetime = event_data.get("ticket_lifetime", 0)
         if lifetime > 864000:  # > 10 days
-            analysis["suspicious"] = True
-            analysis["indicators"].append("Unusually long ticket lifetime")
-            analysis["confidence"] += 0.3
+            analysis.suspicious = True
+            analysis.indicators.append("Unusually long ticket lifetime")
+            analysis.confidence += 0.3
         
         # krbtgt access
         if "krbtgt" in service.lower():
-            analysis["suspicious"] = True
-            analysis["attack_type"] = "golden_ticket"
-            analysis["indicators"].append("krbtgt service access")
-            analysis["confidence"] += 0.5
+            analysis.suspicious = True
+            analysis.attack_type = "golden_ticket"
+            analysis.indicators.append("krbtgt service access")
+            analysis.confidence += 0.5
         
         return analysis
     
-    def _analyze_ldap_traffic(self, ip: str, event_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _analyze_ldap_traffic(self, ip: str, event_data: Dict[str, Any], now: float) -> ProtocolAnalysis:
         """Analyze LDAP traffic for attacks"""
-        analysis = {
-            "suspicious": False,
-            "attack_type": None,
-            "confidence": 0.0,
-            "indicators": []
-        }
+        analysis = ProtocolAnalysis()
         
         query = str(event_data.get("ldap_filter", ""))
         
         # LDAP injection patterns
-        injection_patterns = [
-            r"\(\&.*\(\|",  # Combined AND/OR
-            r"\*\)\(",      # Wildcard tricks
-            r"admin\*",     # Admin wildcards
-            r"\)\)\(",      # Parenthesis manipulation
-        ]
-        
-        for pattern in injection_patterns:
-            if re.search(pattern, query, re.IGNORECASE):
-                analysis["suspicious"] = True
-                analysis["attack_type"] = "ldap_injection"
-                analysis["indicators"].append("LDAP injection pattern detected")
-                analysis["confidence"] += 0.4
-                break
+        if _LDAP_INJECTION_RE.search(query):
+            analysis.suspicious = True
+            analysis.attack_type = "ldap_injection"
+            analysis.indicators.append("LDAP injection pattern detected")
+            analysis.confidence += 0.4
         
         # Enumeration attempts
         if any(attr in query.lower() for attr in ["*", "objectclass=*", "cn=*"]):
-            recent_queries = [
-                e for e in self.network_events[ip]
-                if e.protocol == "LDAP" and time.time() - e.timestamp < 60
-            ]
-            if len(recent_queries) > 10:
-                analysis["suspicious"] = True
-                analysis["indicators"].append("LDAP enumeration detected")
-                analysis["confidence"] += 0.3
+            recent_queries = sum(1 for e in _recent(self.network_events[ip], now - 60) if e.protocol == "LDAP")
+            if recent_queries > 10:
+                analysis.suspicious = True
+                analysis.indicators.append("LDAP enumeration detected")
+                analysis.confidence += 0.3
         
         return analysis
     
-    def _analyze_rpc_traffic(self, ip: str, event_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _analyze_rpc_traffic(self, ip: str, event_data: Dict[str, Any], now: float) -> ProtocolAnalysis:
         """Analyze RPC traffic for attacks"""
-        analysis = {
-            "suspicious": False,
-            "attack_type": None,
-            "confidence": 0.0,
-            "indicators": []
-        }
+        analysis = ProtocolAnalysis()
         
-        interface = str(event_data.get("interface_uuid", ""))
+        interface = str(event_data.get("interface_uuid", "")).lower()
         operation = str(event_data.get("operation", ""))
         
         # Suspicious RPC interfaces
-        suspicious_interfaces = {
-            "ITaskSchedulerService": "scheduled_task_exec",
-            "IRemUnknown2": "dcom_exec",
-            "DCOM": "dcom_exec",
-            "SVCCTL": "service_exec"
-        }
-        
-        for iface, attack in suspicious_interfaces.items():
-            if iface.lower() in interface.lower():
-                analysis["suspicious"] = True
-                analysis["attack_type"] = attack
-                analysis["indicators"].append(f"Suspicious RPC interface: {iface}")
-                analysis["confidence"] += 0.4
+        for needle, iface, attack in _SUSPICIOUS_INTERFACES:
+            if needle in interface:
+                analysis.suspicious = True
+                analysis.attack_type = attack
+                analysis.indicators.append(f"Suspicious RPC interface: {iface}")
+                analysis.confidence += 0.4
         
         # WMI-based execution
         if "Win32_Process" in operation and "Create" in operation:
-            analysis["suspicious"] = True
-            analysis["attack_type"] = "wmi_exec"
-            analysis["indicators"].append("WMI process creation")
-            analysis["confidence"] += 0.4
+            analysis.suspicious = True
+            analysis.attack_type = "wmi_exec"
+            analysis.indicators.append("WMI process creation")
+            analysis.confidence += 0.4
         
         return analysis
     
-    def _check_ntlm_relay(self, ip: str, event_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _check_ntlm_relay(self, ip: str, event_data: Dict[str, Any], now: float) -> Dict[str, Any]:
         """Check for NTLM relay attacks"""
         analysis = {
             "is_relay": False,
@@ -580,56 +757,44 @@ class ImpacketProtection:
             # Same authentication from multiple IPs
             username = event_data.get("username")
             if username:
-                recent_auths = [
-                    e for e in self.auth_attempts.values()
-                    for attempt in e
-                    if attempt["username"] == username and time.time() - attempt["timestamp"] < 60
+                recent_ips = [
+                    source for source, ts in self._auth_by_user.get(username, ())
+                    if now - ts < 60
                 ]
                 
-                unique_ips = len(set(self.auth_attempts.keys()))
-                if unique_ips > 3 and len(recent_auths) > 5:
+                unique_ips = len(set(recent_ips))
+                if unique_ips > 3 and len(recent_ips) > 5:
                     analysis["is_relay"] = True
                     analysis["indicators"].append(f"Same user from {unique_ips} IPs")
         
         return analysis
     
-    def _check_attack_chains(self, ip: str, event_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _check_attack_chains(self, ip: str, event_data: Dict[str, Any], now: float) -> Dict[str, Any]:
         """Check for known attack chains"""
         analysis = {
             "chain_detected": False,
             "chain_type": None
         }
         
-        # Get recent events from this IP
-        recent_events = [
-            e for e in self.network_events[ip]
-            if time.time() - e.timestamp < 300  # Last 5 minutes
-        ]
+        # Indicators seen from this IP in the last 5 minutes
+        seen = 0
+        for e in _recent(self.network_events[ip], now - 300):
+            seen |= e.flags
         
         # PsExec chain: SMB connection → Service creation → Named pipe
-        psexec_chain = [
-            any("ADMIN$" in str(e.details) for e in recent_events),
-            any("SERVICE" in str(e.details) for e in recent_events),
-            any("PIPE" in str(e.details) for e in recent_events)
-        ]
-        if all(psexec_chain):
+        if seen & _PSEXEC_CHAIN == _PSEXEC_CHAIN:
             analysis["chain_detected"] = True
             analysis["chain_type"] = "psexec_execution"
         
         # Secretsdump chain: SMB → Registry access → NTDS access
-        secretsdump_chain = [
-            any("SMB" in e.protocol for e in recent_events),
-            any("REGISTRY" in str(e.details) or "WINREG" in str(e.details) for e in recent_events),
-            any("NTDS" in str(e.details) or "SAM" in str(e.details) for e in recent_events)
-        ]
-        if all(secretsdump_chain):
+        if seen & _SECRETSDUMP_CHAIN == _SECRETSDUMP_CHAIN:
             analysis["chain_detected"] = True
             analysis["chain_type"] = "credential_dumping"
             self.stats["secret_dumps"] += 1
         
         return analysis
     
-    def _check_behavioral_anomalies(self, ip: str) -> Dict[str, Any]:
+    def _check_behavioral_anomalies(self, ip: str, now: float) -> Dict[str, Any]:
         """Check for behavioral anomalies"""
         analysis = {
             "anomalous": False,
@@ -637,29 +802,30 @@ class ImpacketProtection:
             "anomalies": []
         }
         
+        # Count recent and failed attempts in one newest-first pass; attempts
+        # are stored in time order, so the first stale one ends the window
+        recent_auth = failed_auth = 0
+        for attempt in reversed(self.auth_attempts.get(ip, ())):
+            if now - attempt["timestamp"] >= AUTH_WINDOW:
+                break
+            recent_auth += 1
+            if not attempt.get("success", False):
+                failed_auth += 1
+        
         # Rapid authentication attempts
-        recent_auth = [
-            a for a in self.auth_attempts[ip]
-            if time.time() - a["timestamp"] < 60
-        ]
-        if len(recent_auth) > 10:
+        if recent_auth > 10:
             analysis["anomalous"] = True
             analysis["anomalies"].append("Rapid authentication attempts")
             analysis["confidence_boost"] += 0.2
         
         # Multiple failed authentications
-        failed_auth = [a for a in recent_auth if not a.get("success", False)]
-        if len(failed_auth) > 5:
+        if failed_auth > 5:
             analysis["anomalous"] = True
             analysis["anomalies"].append("Multiple failed authentications")
             analysis["confidence_boost"] += 0.2
         
         # Protocol switching (sign of automated tools)
-        recent_events = [
-            e for e in self.network_events[ip]
-            if time.time() - e.timestamp < 60
-        ]
-        protocols = set(e.protocol for e in recent_events)
+        protocols = set(e.protocol for e in _recent(self.network_events[ip], now - 60))
         if len(protocols) > 3:
             analysis["anomalous"] = True
             analysis["anomalies"].append(f"Rapid protocol switching: {', '.join(protocols)}")
@@ -684,8 +850,9 @@ class ImpacketProtection:
         self.suspicious_ips.add(ip)
         
         # Log attack
-        print(f"[IMPACKET ATTACK] Blocked {ip} - {analysis['attack_type']} (confidence: {analysis['confidence']:.2f})")
-        print(f"  Indicators: {', '.join(analysis['indicators'])}")
+        logger.warning("[IMPACKET ATTACK] Blocked %s - %s (confidence: %.2f)",
+                       ip, analysis["attack_type"], analysis["confidence"])
+        logger.warning("  Indicators: %s", ", ".join(analysis["indicators"]))
     
     def _generate_recommendations(self, analysis: Dict[str, Any]) -> List[str]:
         """Generate security recommendations based on attack type"""
@@ -9,22 +9,71 @@ Capabilities:
 """
 
 import docker
-from typing import Dict, List, Optional
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
 import time
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+TRAPPED_CACHE_TTL = 10.0  # Seconds a trapped-container listing is reused
+DOCKER_POOL_SIZE = 32  # Keep-alive connections to the daemon socket, shared by all calls
+MAX_PARALLEL_OPS = 16  # Container operations run concurrently in bulk calls
+PIHOLE_BATCH_SIZE = 100  # Blocklist entries submitted per Pi-hole request
+STATS_CACHE_TTL = 5.0  # Seconds a container's stats snapshot is reused
+STATS_CACHE_SIZE = 1024  # Cached snapshots before expired ones are pruned
+ISOLATED_CAPACITY = 10000  # Traps tracked at once; the oldest is released beyond this
+_IP_NAME_TABLE = str.maketrans(".:", "__")  # IP -> container-name-safe form
+
+
+def _trapped_entry(container_id: str, labels: Dict, status: str) -> Dict:
+    """Trapped-attacker record from a container's ID, labels and status."""
+    return {
+        "container_id": container_id[:12],
+        "attacker_ip": labels.get("ztai.attacker_ip"),
+        "threat": labels.get("ztai.threat"),
+        "timestamp": float(labels.get("ztai.timestamp", 0)),
+        "status": status
+    }
 
 
 class DockerController:
     """Controls Docker containers for attacker isolation."""
     
     def __init__(self, pihole_url: str = "http://pihole:80"):
+        self._trapped_cache: Optional[Tuple[float, List[Dict]]] = None  # (listed_at, containers)
+        self._stats_cache: Dict[str, Tuple[float, Dict]] = {}  # container_id -> (sampled_at, stats)
+        self._live_trapped: Optional[Dict[str, Dict]] = None  # container_id -> record, while the event watcher runs
+        self._live_lock = threading.Lock()
+        self._events = None
+        
+        # Oldest-first; guarded by _lock since API handlers call in from threads
+        self.isolated_containers: OrderedDict[str, str] = OrderedDict()  # IP -> container_id
+        self._isolating: Dict[str, threading.Event] = {}  # IP -> set once its trap is created or failed
+        self._lock = threading.Lock()
+        self.pihole_url = pihole_url
+        self._pihole_token: Optional[str] = None
+        
+        # One keep-alive session for all Pi-hole calls
+        self._http = requests.Session()
+        self._http.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self._http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        
         try:
-            self.client = docker.from_env()
-            self.pihole_url = pihole_url
-            self.isolated_containers: Dict[str, str] = {}  # IP -> container_id
+            self.client = docker.from_env(max_pool_size=DOCKER_POOL_SIZE)
         except Exception as e:
-            print(f"Warning: Docker not available: {e}")
+            logger.warning("Docker not available: %s", e)
             self.client = None
+        
+        if self.client:
+            threading.Thread(target=self._watch_trapped, name="ztai-trap-events", daemon=True).start()
     
     def isolate_attacker(self, attacker_ip: str, threat_category: str, risk_score: int) -> Optional[str]:
         """
@@ -41,16 +90,28 @@ class DockerController:
         if not self.client:
             return None
         
+        # Check if already isolated; concurrent calls for the same IP wait
+        # for the first one instead of starting a second trap
+        with self._lock:
+            container_id = self.isolated_containers.get(attacker_ip)
+            if container_id:
+                return container_id
+            in_flight = self._isolating.get(attacker_ip)
+            if in_flight is None:
+                self._isolating[attacker_ip] = threading.Event()
+        if in_flight is not None:
+            in_flight.wait()
+            with self._lock:
+                return self.isolated_containers.get(attacker_ip)
+        
+        evicted = None
         try:
-            # Check if already isolated
-            if attacker_ip in self.isolated_containers:
-                return self.isolated_containers[attacker_ip]
-            
             # Create isolated container
+            now = f"{time.time():.0f}"
             container = self.client.containers.run(
                 "ztai-honeypot:latest",
                 detach=True,
-                name=f"trap_{attacker_ip.replace('.', '_')}_{int(time.time())}",
+                name=f"trap_{attacker_ip.translate(_IP_NAME_TABLE)}_{now}",
                 network="attacker_trap",
                 environment={
                     "ATTACKER_IP": attacker_ip,
@@ -61,7 +122,7 @@ class DockerController:
                     "ztai.trapped": "true",
                     "ztai.attacker_ip": attacker_ip,
                     "ztai.threat": threat_category,
-                    "ztai.timestamp": str(time.time())
+                    "ztai.timestamp": now
                 },
                 mem_limit="256m",
                 cpu_period=100000,
@@ -69,14 +130,47 @@ class DockerController:
                 restart_policy={"Name": "unless-stopped"}
             )
             
-            self.isolated_containers[attacker_ip] = container.id
-            print(f"[DOCKER] Isolated {attacker_ip} in container {container.short_id}")
+            with self._lock:
+                self.isolated_containers[attacker_ip] = container.id
+                if len(self.isolated_containers) > ISOLATED_CAPACITY:
+                    evicted = self.isolated_containers.popitem(last=False)
+                self._trapped_cache = None
+            logger.info("[DOCKER] Isolated %s in container %s", attacker_ip, container.short_id)
             
             return container.id
             
         except Exception as e:
-            print(f"[DOCKER] Failed to isolate {attacker_ip}: {e}")
+            logger.error("[DOCKER] Failed to isolate %s: %s", attacker_ip, e)
             return None
+        
+        finally:
+            with self._lock:
+                self._isolating.pop(attacker_ip).set()
+            if evicted:
+                # Over capacity: release the oldest trap rather than leave it
+                # running untracked
+                self._release_evicted(*evicted)
+    
+    def isolate_attackers_bulk(self, attackers: List[Dict]) -> Dict[str, Optional[str]]:
+        """
+        Isolate several attackers at once, creating their containers concurrently.
+        
+        Args:
+            attackers: Dicts with attacker_ip, threat_category and risk_score
+            
+        Returns:
+            Mapping of attacker IP to container ID (None where isolation failed)
+        """
+        unique = list({a["attacker_ip"]: a for a in attackers}.values())
+        if not unique:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_OPS, len(unique))) as pool:
+            container_ids = pool.map(
+                lambda a: self.isolate_attacker(a["attacker_ip"], a["threat_category"], a["risk_score"]),
+                unique
+            )
+            return dict(zip((a["attacker_ip"] for a in unique), container_ids))
     
     def block_via_pihole(self, domain_or_ip: str) -> bool:
         """
@@ -90,7 +184,7 @@ class DockerController:
         """
         try:
             # Add to Pi-hole blacklist
-            response = requests.post(
+            response = self._http.post(
                 f"{self.pihole_url}/admin/api.php",
                 data={
                     "list": "black",
@@ -101,38 +195,91 @@ class DockerController:
             )
             
             if response.status_code == 200:
-                print(f"[PIHOLE] Blocked {domain_or_ip}")
+                logger.info("[PIHOLE] Blocked %s", domain_or_ip)
                 return True
                 
         except Exception as e:
-            print(f"[PIHOLE] Failed to block {domain_or_ip}: {e}")
+            logger.error("[PIHOLE] Failed to block %s: %s", domain_or_ip, e)
         
         return False
     
+    def block_many_via_pihole(self, items: Iterable[str], chunk: int = PIHOLE_BATCH_SIZE) -> int:
+        """
+        Block many domains or IPs via Pi-hole, several entries per request.
+        
+        Args:
+            items: Domain names or IPs to block
+            chunk: Entries per request (Pi-hole takes them space-separated)
+            
+        Returns:
+            Number of entries blocked
+        """
+        items = list(dict.fromkeys(items))
+        blocked = 0
+        
+        for start in range(0, len(items), chunk):
+            batch = items[start:start + chunk]
+            try:
+                response = self._http.post(
+                    f"{self.pihole_url}/admin/api.php",
+                    data={
+                        "list": "black",
+                        "add": " ".join(batch),
+                        "token": self._get_pihole_token()
+                    },
+                    timeout=5
+                )
+                
+                if response.status_code == 200:
+                    blocked += len(batch)
+                    
+            except Exception as e:
+                logger.error("[PIHOLE] Failed to block %d entries: %s", len(batch), e)
+        
+        if blocked:
+            logger.info("[PIHOLE] Blocked %d entries", blocked)
+        return blocked
+    
+    async def block_via_pihole_async(self, domain_or_ip: str) -> bool:
+        """block_via_pihole for async callers; the request runs on a worker thread."""
+        return await asyncio.to_thread(self.block_via_pihole, domain_or_ip)
+    
+    async def block_many_via_pihole_async(self, items: Iterable[str], chunk: int = PIHOLE_BATCH_SIZE) -> int:
+        """block_many_via_pihole for async callers; the requests run on a worker thread."""
+        return await asyncio.to_thread(self.block_many_via_pihole, list(items), chunk)
+    
     def get_trapped_attackers(self) -> List[Dict]:
         """Get list of currently trapped attackers."""
         if not self.client:
             return []
         
+        # Served from the event-maintained index while the watcher is running
+        with self._live_lock:
+            if self._live_trapped is not None:
+                return list(self._live_trapped.values())
+        
         try:
-            containers = self.client.containers.list(
-                filters={"label": "ztai.trapped=true"}
-            )
-            
-            trapped = []
-            for container in containers:
-                trapped.append({
-                    "container_id": container.short_id,
-                    "attacker_ip": container.labels.get("ztai.attacker_ip"),
-                    "threat": container.labels.get("ztai.threat"),
-                    "timestamp": float(container.labels.get("ztai.timestamp", 0)),
-                    "status": container.status
-                })
+            return [
+                _trapped_entry(container["Id"], container.get("Labels") or {}, container.get("State"))
+                for container in self._list_trapped()
+            ]
             
-            return trapped
+        except Exception as e:
+            logger.error("[DOCKER] Error getting trapped attackers: %s", e)
+            return []
+    
+    def get_trapped_by_ip(self, attacker_ip: str) -> List:
+        """Get the trap containers holding one attacker, filtered by the daemon."""
+        if not self.client:
+            return []
+        
+        try:
+            return self.client.containers.list(
+                filters={"label": ["ztai.trapped=true", f"ztai.attacker_ip={attacker_ip}"]}
+            )
             
         except Exception as e:
-            print(f"[DOCKER] Error getting trapped attackers: {e}")
+            logger.error("[DOCKER] Error looking up trap for %s: %s", attacker_ip, e)
             return []
     
     def release_attacker(self, attacker_ip: str) -> bool:
@@ -145,23 +292,33 @@ class DockerController:
         Returns:
             True if successful
         """
-        if not self.client or attacker_ip not in self.isolated_containers:
+        if not self.client:
             return False
         
         try:
-            container_id = self.isolated_containers[attacker_ip]
-            container = self.client.containers.get(container_id)
+            with self._lock:
+                container_id = self.isolated_containers.get(attacker_ip)
+            if container_id:
+                container_ids = [container_id]
+            else:
+                # Trapped before this process started; look it up by label
+                container_ids = [container.id for container in self.get_trapped_by_ip(attacker_ip)]
+                if not container_ids:
+                    return False
             
-            container.stop(timeout=5)
-            container.remove()
+            for container_id in container_ids:
+                self._stop_and_remove(container_id)
             
-            del self.isolated_containers[attacker_ip]
-            print(f"[DOCKER] Released {attacker_ip} from isolation")
+            with self._lock:
+                if self.isolated_containers.get(attacker_ip) in container_ids:
+                    del self.isolated_containers[attacker_ip]
+                self._trapped_cache = None
+            logger.info("[DOCKER] Released %s from isolation", attacker_ip)
             
             return True
             
         except Exception as e:
-            print(f"[DOCKER] Error releasing {attacker_ip}: {e}")
+            logger.error("[DOCKER] Error releasing %s: %s", attacker_ip, e)
             return False
     
     def cleanup_old_traps(self, max_age_hours: int = 24):
@@ -170,61 +327,164 @@ class DockerController:
             return
         
         try:
-            containers = self.client.containers.list(
-                filters={"label": "ztai.trapped=true"}
-            )
+            # Plain dicts from the list endpoint; no Container objects are built.
+            # Docker's since/before filters take container IDs, not times, so
+            # the age check stays here
+            containers = self.client.api.containers(filters={"label": "ztai.trapped=true"})
             
-            current_time = time.time()
-            cleaned = 0
+            cutoff = time.time() - max_age_hours * 3600
+            expired = [
+                container["Id"] for container in containers
+                if float((container.get("Labels") or {}).get("ztai.timestamp", 0)) < cutoff
+            ]
+            if not expired:
+                return
             
-            for container in containers:
-                timestamp = float(container.labels.get("ztai.timestamp", 0))
-                age_hours = (current_time - timestamp) / 3600
-                
-                if age_hours > max_age_hours:
-                    container.stop(timeout=5)
-                    container.remove()
+            # Each stop can block for its timeout, so stop them side by side
+            with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_OPS, len(expired))) as pool:
+                futures = [pool.submit(self._stop_and_remove, container_id) for container_id in expired]
+            
+            cleaned = 0
+            for container_id, future in zip(expired, futures):
+                if future.exception() is None:
                     cleaned += 1
+                else:
+                    logger.error("[DOCKER] Error removing trap %s: %s", container_id[:12], future.exception())
             
             if cleaned > 0:
-                print(f"[DOCKER] Cleaned up {cleaned} old trap containers")
+                self._trapped_cache = None
+                logger.info("[DOCKER] Cleaned up %d old trap containers", cleaned)
                 
         except Exception as e:
-            print(f"[DOCKER] Error during cleanup: {e}")
+            logger.error("[DOCKER] Error during cleanup: %s", e)
     
-    def get_container_stats(self, container_id: str) -> Optional[Dict]:
-        """Get resource usage stats for a container."""
+    def get_container_stats(self, container_id: str, cache_stats: bool = True) -> Optional[Dict]:
+        """Get resource usage stats for a container, reusing a snapshot younger than STATS_CACHE_TTL."""
         if not self.client:
             return None
         
+        now = time.time()
+        if cache_stats:
+            cached = self._stats_cache.get(container_id)
+            if cached and now - cached[0] < STATS_CACHE_TTL:
+                return cached[1]
+        
         try:
-            container = self.client.containers.get(container_id)
-            stats = container.stats(stream=False)
+            # Low-level call: one request, no Container object to hydrate first
+            stats = self.client.api.stats(container_id, stream=False)
             
             # Calculate CPU percentage
-            cpu_delta = stats["cpu_stats"]["cpu_usage"]["total_usage"] - \
-                       stats["precpu_stats"]["cpu_usage"]["total_usage"]
-            system_delta = stats["cpu_stats"]["system_cpu_usage"] - \
-                          stats["precpu_stats"]["system_cpu_usage"]
+            cpu_stats = stats.get("cpu_stats", {})
+            precpu_stats = stats.get("precpu_stats", {})
+            cpu_delta = cpu_stats.get("cpu_usage", {}).get("total_usage", 0) - \
+                       precpu_stats.get("cpu_usage", {}).get("total_usage", 0)
+            system_delta = cpu_stats.get("system_cpu_usage", 0) - \
+                          precpu_stats.get("system_cpu_usage", 0)
             cpu_percent = (cpu_delta / system_delta) * 100.0 if system_delta > 0 else 0
             
             # Calculate memory usage
-            mem_usage = stats["memory_stats"]["usage"]
-            mem_limit = stats["memory_stats"]["limit"]
+            memory_stats = stats.get("memory_stats", {})
+            mem_usage = memory_stats.get("usage", 0)
+            mem_limit = memory_stats.get("limit", 0)
             mem_percent = (mem_usage / mem_limit) * 100.0 if mem_limit > 0 else 0
             
-            return {
+            result = {
                 "cpu_percent": cpu_percent,
                 "memory_usage_mb": mem_usage / (1024 * 1024),
                 "memory_limit_mb": mem_limit / (1024 * 1024),
                 "memory_percent": mem_percent
             }
             
+            if len(self._stats_cache) >= STATS_CACHE_SIZE:
+                self._stats_cache = {
+                    cid: entry for cid, entry in self._stats_cache.items()
+                    if now - entry[0] < STATS_CACHE_TTL
+                }
+            self._stats_cache[container_id] = (now, result)
+            
+            return result
+            
         except Exception as e:
-            print(f"[DOCKER] Error getting stats: {e}")
+            logger.error("[DOCKER] Error getting stats: %s", e)
             return None
     
+    def get_container_stats_bulk(self, container_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """Get resource usage stats for several containers, polled concurrently."""
+        if not container_ids:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_OPS, len(container_ids))) as pool:
+            return dict(zip(container_ids, pool.map(self.get_container_stats, container_ids)))
+    
+    def close(self):
+        """Close the Docker client and the Pi-hole session (on agent shutdown)."""
+        self._http.close()
+        if self._events:
+            self._events.close()
+        if self.client:
+            self.client.close()
+            self.client = None
+    
+    def _release_evicted(self, attacker_ip: str, container_id: str):
+        """Stop the trap whose mapping was evicted to stay within ISOLATED_CAPACITY."""
+        try:
+            self._stop_and_remove(container_id)
+            logger.info("[DOCKER] Released %s to stay within capacity", attacker_ip)
+        except Exception as e:
+            logger.error("[DOCKER] Failed to release evicted trap for %s: %s", attacker_ip, e)
+    
+    def _stop_and_remove(self, container_id: str):
+        """Stop and remove one container by ID."""
+        self.client.api.stop(container_id, timeout=5)
+        self.client.api.remove_container(container_id)
+    
+    def _watch_trapped(self):
+        """Keep _live_trapped in sync with trap container events (runs in a thread)."""
+        try:
+            # Subscribe before seeding so nothing started in between is missed
+            self._events = self.client.events(
+                filters={"type": "container", "label": "ztai.trapped=true"},
+                decode=True
+            )
+            live = {
+                container["Id"]: _trapped_entry(container["Id"], container.get("Labels") or {}, container.get("State"))
+                for container in self._list_trapped(force=True)
+            }
+            with self._live_lock:
+                self._live_trapped = live
+            
+            for event in self._events:
+                action = event.get("Action")
+                actor = event.get("Actor", {})
+                container_id = actor.get("ID")
+                with self._live_lock:
+                    if action == "start":
+                        live[container_id] = _trapped_entry(container_id, actor.get("Attributes", {}), "running")
+                    elif action in ("die", "destroy"):
+                        live.pop(container_id, None)
+                        
+        except Exception as e:
+            logger.error("[DOCKER] Trap event stream stopped: %s", e)
+        finally:
+            # Fall back to listing containers on demand
+            with self._live_lock:
+                self._live_trapped = None
+    
+    def _list_trapped(self, force: bool = False) -> List[Dict]:
+        """
+        List running trapped containers as the list endpoint's plain dicts (no
+        Container objects), reusing a listing younger than TRAPPED_CACHE_TTL.
+        """
+        now = time.time()
+        if not force and self._trapped_cache and now - self._trapped_cache[0] < TRAPPED_CACHE_TTL:
+            return self._trapped_cache[1]
+        
+        containers = self.client.api.containers(filters={"label": "ztai.trapped=true"})
+        self._trapped_cache = (now, containers)
+        return containers
+    
     def _get_pihole_token(self) -> str:
-        """Get Pi-hole API token (placeholder - should be configured)."""
-        # In production, this would read from environment or config
-        return ""
+        """Get Pi-hole API token from PIHOLE_TOKEN, read once and cached."""
+        if self._pihole_token is None:
+            self._pihole_token = os.environ.get("PIHOLE_TOKEN", "")
+        return self._pihole_token
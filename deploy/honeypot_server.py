@@ -4,39 +4,206 @@ NO internet access. All data is fake and tracked.
 """
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import PlainTextResponse, Response
 import sys
 from pathlib import Path
+import asyncio
 import time
 import json
+import logging
+import os
+import struct
+from collections import deque
+from functools import lru_cache
+
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    _MSGPACK_AVAILABLE = True
+except ImportError:
+    _MSGPACK_AVAILABLE = False
 
 sys.path.insert(0, str(Path(__file__).parent))
 
 from deception.honeypot_generator import HoneypotGenerator
 from deception.tracking_tokens import TrackingTokenManager
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Honeypot Trap", docs_url=None, redoc_url=None)
 
 token_mgr = TrackingTokenManager()
 honeypot = HoneypotGenerator(token_mgr)
 
-# Log all access attempts
-access_log = []
+# Fake payloads are generated once per shape around a placeholder token; each
+# request only splices in its own tracking token and the prefixes some fields use
+TOKEN_PLACEHOLDER = "~~TRACKINGTOKEN~"  # Same length as a real tracking token
+_TOKEN_PREFIXES = (len(TOKEN_PLACEHOLDER), 8, 6, 4)  # Longest first, so prefixes never clip a full token
+
+def _json_body(content) -> bytes:
+    """Serialize compactly like JSONResponse does, with orjson when available."""
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+def _with_token(template: bytes, tracking_token: str) -> bytes:
+    """Substitute a tracking token into a payload template."""
+    token = tracking_token.encode()
+    for n in _TOKEN_PREFIXES:
+        template = template.replace(TOKEN_PLACEHOLDER[:n].encode(), token[:n])
+    return template
+
+_PAYLOAD_BUILDERS = {
+    "env": lambda count: honeypot.generate_fake_env_file(TOKEN_PLACEHOLDER).encode(),
+    "config": lambda count: _json_body(json.loads(honeypot.generate_fake_config_file("json", TOKEN_PLACEHOLDER))),
+    "backup": lambda count: honeypot.generate_fake_database_dump("users", count, TOKEN_PLACEHOLDER).encode(),
+    "keys": lambda count: _json_body(honeypot.generate_fake_api_keys(count, TOKEN_PLACEHOLDER)),
+    "users": lambda count: _json_body(honeypot.generate_honeypot_credentials(count, TOKEN_PLACEHOLDER))
+}
+
+@lru_cache(maxsize=64)
+def _payload_template(kind: str, count: int = 0) -> bytes:
+    """Payload template for one (kind, count) shape, generated on first use."""
+    return _PAYLOAD_BUILDERS[kind](count)
+
+# Log all access attempts; only the most recent are kept in memory
+ACCESS_LOG_SIZE = 10000
+access_log = deque(maxlen=ACCESS_LOG_SIZE)
+access_count = 0
+
+# Entries are written to disk by a background task, off the request path.
+# With msgpack each record is a 4-byte little-endian length followed by the
+# packed entry; otherwise entries fall back to JSON lines.
+LOG_DIR = "/honeypot/data/tracking"
+LOG_PATH = os.path.join(LOG_DIR, "access.msgpack" if _MSGPACK_AVAILABLE else "access.log")
+LOG_ROTATE_BYTES = 64 << 20  # Full shards are renamed aside and a new file started
+LOG_BATCH_SIZE = 256
+LOG_RETRY_SECONDS = 5.0  # Wait before reopening the log after an I/O error
+log_queue: asyncio.Queue = asyncio.Queue(maxsize=10000)
+log_dropped = 0  # Entries not written because the queue was full
+_log_writer_task = None
+_RECORD_LENGTH = struct.Struct("<I")
+
+def _encode_entry(entry) -> bytes:
+    """Encode one access entry as a log record."""
+    if _MSGPACK_AVAILABLE:
+        packed = msgpack.packb(entry, use_bin_type=True)
+        return _RECORD_LENGTH.pack(len(packed)) + packed
+    return _json_body(entry) + b"\n"
+
+def _open_log():
+    """Open the access log for appending, creating its directory if needed."""
+    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+    return open(LOG_PATH, "ab", buffering=1 << 16)
+
+def _close_log(f):
+    """Close the access log, ignoring errors from a file already in a bad state."""
+    try:
+        f.close()
+    except OSError:
+        pass
+
+def _write_entries(f, entries):
+    """Append access entries to the open log file."""
+    if entries:
+        f.write(b"".join(map(_encode_entry, entries)))
+        f.flush()
+
+def _rotate_if_full(f):
+    """Rename a full log aside and return a fresh one, or f if there is room."""
+    if f.tell() < LOG_ROTATE_BYTES:
+        return f
+    f.close()
+    root, ext = os.path.splitext(LOG_PATH)
+    os.rename(LOG_PATH, f"{root}.{time.time_ns()}{ext}")
+    return _open_log()
+
+async def log_writer():
+    """Drain the log queue into the access log, one write per batch."""
+    f = None
+    batch = []
+    try:
+        while True:
+            if not batch:
+                batch.append(await log_queue.get())
+            while len(batch) < LOG_BATCH_SIZE and not log_queue.empty():
+                batch.append(log_queue.get_nowait())
+            try:
+                if f is None:
+                    f = _open_log()
+                _write_entries(f, batch)
+                batch = []
+                f = _rotate_if_full(f)
+            except OSError as e:
+                # Keep the batch and retry; entries arriving meanwhile queue
+                # up and are counted in log_dropped once the queue fills
+                logger.error("[HONEYPOT] Access log write failed, retrying in %ss: %s", LOG_RETRY_SECONDS, e)
+                if f is not None:
+                    _close_log(f)
+                    f = None
+                await asyncio.sleep(LOG_RETRY_SECONDS)
+    except asyncio.CancelledError:
+        # Shutting down: write whatever is still queued
+        while not log_queue.empty():
+            batch.append(log_queue.get_nowait())
+        try:
+            if f is None:
+                f = _open_log()
+            _write_entries(f, batch)
+        except OSError as e:
+            logger.error("[HONEYPOT] Lost %d access entries at shutdown: %s", len(batch), e)
+        raise
+    finally:
+        if f is not None:
+            _close_log(f)
+
+@app.on_event("startup")
+async def start_log_writer():
+    """Start the background access log writer."""
+    global _log_writer_task
+    _log_writer_task = asyncio.create_task(log_writer())
+
+@app.on_event("shutdown")
+async def stop_log_writer():
+    """Flush queued access entries and stop the writer."""
+    if _log_writer_task:
+        _log_writer_task.cancel()
+        try:
+            await _log_writer_task
+        except asyncio.CancelledError:
+            pass
+
+@app.on_event("startup")
+async def warm_payload_templates():
+    """Build the fixed-shape payload templates before the first request."""
+    # Same arguments as the endpoints pass, so they hit the same cache entries
+    for shape in (("env",), ("config",), ("backup", 1000), ("keys", 20), ("users", 50)):
+        _payload_template(*shape)
 
 @app.middleware("http")
 async def log_access(request: Request, call_next):
     """Log all access attempts to this honeypot."""
-    access_log.append({
+    global access_count, log_dropped
+    entry = {
         "timestamp": time.time(),
         "method": request.method,
         "path": request.url.path,
         "ip": request.client.host,
         "headers": dict(request.headers)
-    })
+    }
+    access_log.append(entry)
+    access_count += 1
     
-    # Save to file
-    with open("/honeypot/data/tracking/access.log", "a") as f:
-        f.write(json.dumps(access_log[-1]) + "\n")
+    # Queue for the log writer
+    try:
+        log_queue.put_nowait(entry)
+    except asyncio.QueueFull:
+        log_dropped += 1
     
     response = await call_next(request)
     return response
@@ -50,36 +217,36 @@ async def root():
 async def fake_env():
     """Serve fake environment file."""
     tracking_token = token_mgr.generate_token(context={"endpoint": "/.env"})
-    return PlainTextResponse(honeypot.generate_fake_env_file(tracking_token))
+    return PlainTextResponse(_with_token(_payload_template("env"), tracking_token))
 
 @app.get("/admin/config")
 async def fake_config():
     """Serve fake config."""
     tracking_token = token_mgr.generate_token(context={"endpoint": "/admin/config"})
-    return JSONResponse(json.loads(honeypot.generate_fake_config_file("json", tracking_token)))
+    return Response(_with_token(_payload_template("config"), tracking_token), media_type="application/json")
 
 @app.get("/admin/backup")
 async def fake_backup():
     """Serve fake database dump."""
     tracking_token = token_mgr.generate_token(context={"endpoint": "/admin/backup"})
-    return PlainTextResponse(honeypot.generate_fake_database_dump("users", 1000, tracking_token))
+    return PlainTextResponse(_with_token(_payload_template("backup", 1000), tracking_token))
 
 @app.get("/api/keys")
 async def fake_api_keys():
     """Serve fake API keys."""
     tracking_token = token_mgr.generate_token(context={"endpoint": "/api/keys"})
-    return JSONResponse(honeypot.generate_fake_api_keys(20, tracking_token))
+    return Response(_with_token(_payload_template("keys", 20), tracking_token), media_type="application/json")
 
 @app.get("/api/users")
 async def fake_users():
     """Serve fake user credentials."""
     tracking_token = token_mgr.generate_token(context={"endpoint": "/api/users"})
-    return JSONResponse(honeypot.generate_honeypot_credentials(50, tracking_token))
+    return Response(_with_token(_payload_template("users", 50), tracking_token), media_type="application/json")
 
 @app.get("/health")
 async def health():
     """Health check."""
-    return {"status": "trapped", "access_count": len(access_log)}
+    return {"status": "trapped", "access_count": access_count, "log_dropped": log_dropped}
 
 if __name__ == "__main__":
     import uvicorn
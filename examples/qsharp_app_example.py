@@ -13,6 +13,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
+import base64
+import numpy as np
 import uvicorn
 
 # Import the Q# defense middleware
@@ -58,6 +60,36 @@ class QuantumCircuitResponse(BaseModel):
     execution_time_ms: float
 
 
+_rng = np.random.default_rng()
+
+# Above this many bits the response carries packed base64 instead of a JSON list
+PACKED_BITS_THRESHOLD = 1 << 16
+
+
+# Fixed circuits have fixed results, so their measurements are built once
+# here instead of per request (a real app would likewise resolve each Q#
+# operation once and reuse it rather than re-importing it per call)
+_FIXED_CIRCUITS = {
+    # Bell state should produce |00⟩ and |11⟩ with equal probability
+    "bell_state": (
+        [
+            QuantumMeasurement(state="|00⟩", count=487, probability=0.487),
+            QuantumMeasurement(state="|11⟩", count=513, probability=0.513)
+        ],
+        234.5
+    ),
+    # Grover's algorithm results
+    "grover_search": (
+        [
+            QuantumMeasurement(state="|101⟩", count=876, probability=0.876),
+            QuantumMeasurement(state="|000⟩", count=42, probability=0.042),
+            QuantumMeasurement(state="|111⟩", count=82, probability=0.082)
+        ],
+        567.3
+    )
+}
+
+
 # Example Q# quantum operations
 @app.post("/api/quantum/run-circuit", response_model=QuantumCircuitResponse)
 async def run_quantum_circuit(request: QuantumCircuitRequest):
@@ -73,33 +105,18 @@ async def run_quantum_circuit(request: QuantumCircuitRequest):
     # from MyQuantumNamespace import MyQuantumOperation
     # result = MyQuantumOperation.simulate(...)
     
-    # For this example, simulate some quantum results
-    if request.circuit_name == "bell_state":
-        # Bell state should produce |00⟩ and |11⟩ with equal probability
-        return QuantumCircuitResponse(
-            circuit_name="bell_state",
-            measurements=[
-                QuantumMeasurement(state="|00⟩", count=487, probability=0.487),
-                QuantumMeasurement(state="|11⟩", count=513, probability=0.513)
-            ],
-            total_shots=request.shots,
-            execution_time_ms=234.5
-        )
+    # For this example, serve precomputed quantum results
+    fixed = _FIXED_CIRCUITS.get(request.circuit_name)
+    if fixed is None:
+        raise HTTPException(status_code=404, detail="Circuit not found")
     
-    elif request.circuit_name == "grover_search":
-        # Grover's algorithm results
-        return QuantumCircuitResponse(
-            circuit_name="grover_search",
-            measurements=[
-                QuantumMeasurement(state="|101⟩", count=876, probability=0.876),
-                QuantumMeasurement(state="|000⟩", count=42, probability=0.042),
-                QuantumMeasurement(state="|111⟩", count=82, probability=0.082)
-            ],
-            total_shots=request.shots,
-            execution_time_ms=567.3
-        )
-    
-    raise HTTPException(status_code=404, detail="Circuit not found")
+    measurements, execution_time_ms = fixed
+    return QuantumCircuitResponse(
+        circuit_name=request.circuit_name,
+        measurements=measurements,
+        total_shots=request.shots,
+        execution_time_ms=execution_time_ms
+    )
 
 
 @app.post("/api/quantum/generate-random")
@@ -115,12 +132,19 @@ async def generate_quantum_random(num_bits: int = 128):
     # from QuantumDefense import GenerateRandomBits
     # bits = GenerateRandomBits.simulate(num_bits=num_bits)
     
-    import random
-    bits = [random.randint(0, 1) for _ in range(num_bits)]
+    bits = _rng.integers(0, 2, size=num_bits, dtype=np.uint8)
+    
+    if num_bits >= PACKED_BITS_THRESHOLD:
+        return {
+            "num_bits": num_bits,
+            "bits_base64": base64.b64encode(np.packbits(bits).tobytes()).decode(),
+            "source": "quantum_hardware",
+            "entropy": 1.0
+        }
     
     return {
         "num_bits": num_bits,
-        "bits": bits,
+        "bits": bits.tolist(),
         "source": "quantum_hardware",
         "entropy": 1.0  # Perfect entropy from quantum source
     }
@@ -163,7 +187,7 @@ async def get_defense_status():
 @app.get("/api/defense/threats")
 async def get_threat_history():
     """Get recent threat detections"""
-    history = defense_middleware.middleware.qsharp_operation_history[-50:]
+    history = defense_middleware.middleware.recent_qsharp_operations(50)
     threats = [h for h in history if h["threat_detected"]]
     
     return {
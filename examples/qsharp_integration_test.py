@@ -6,6 +6,7 @@ import sys
 from pathlib import Path
 import json
 import asyncio
+import numpy as np
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -63,8 +64,7 @@ async def test_qsharp_integration():
     @app.post("/quantum/qrng")
     async def quantum_rng(num_bits: int = 256):
         """Generate quantum random numbers"""
-        import random
-        bits = [random.randint(0, 1) for _ in range(num_bits)]
+        bits = np.random.default_rng().integers(0, 2, size=num_bits, dtype=np.uint8).tolist()
         return {
             "operation": "qrng",
             "num_bits": num_bits,
@@ -4,16 +4,43 @@ Integrates zero-trust AI defense with Q# quantum computing applications
 """
 import sys
 import json
+import secrets
 import time
+from collections import deque
+from itertools import islice
 from pathlib import Path
 from typing import Dict, Any, Callable, Optional
 import asyncio
 
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
 # Add parent to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from core.orchestrator import DefenseOrchestrator
 
+OPERATION_HISTORY_SIZE = 1000  # Most recent Q# operations kept for stats
+CONTENT_SCAN_LIMIT = 1 << 20  # Leading body bytes decoded for content analysis
+
+# Fake threat responses are serialized once around a placeholder token; each
+# threat only splices in its own tracking token
+TOKEN_PLACEHOLDER = "~~TRACKINGTOKEN~"
+THREAT_CATEGORIES = ("model_extraction", "data_exfiltration", "unknown")
+
+
+def _json_body(content) -> bytes:
+    """Serialize compactly like JSONResponse does, with orjson when available."""
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+_TOKEN_PLACEHOLDER_JSON = _json_body(TOKEN_PLACEHOLDER)
+
 
 class QSharpDefenseMiddleware:
     """
@@ -34,8 +61,22 @@ class QSharpDefenseMiddleware:
         self.orchestrator = DefenseOrchestrator(config_dir, base_dir)
         self.enable_quantum_enhanced = enable_quantum_enhanced
         
-        # Track Q# operations for pattern analysis
-        self.qsharp_operation_history = []
+        # Track Q# operations for pattern analysis; the threat count is kept
+        # alongside so stats never rescan the history
+        self.qsharp_operation_history = deque(maxlen=OPERATION_HISTORY_SIZE)
+        self._threat_count = 0
+        
+        # Pre-serialized threat responses; categories without their own
+        # fake data share the generic one
+        self._threat_templates = {
+            category: _json_body({
+                "status": "success",
+                "data": self._generate_qsharp_fake_data(category, TOKEN_PLACEHOLDER),
+                "tracking_token": TOKEN_PLACEHOLDER,
+                "quantum_enhanced": self.enable_quantum_enhanced
+            })
+            for category in THREAT_CATEGORIES
+        }
         
     async def __call__(self, request: Any, call_next: Callable) -> Any:
         """
@@ -74,7 +115,7 @@ class QSharpDefenseMiddleware:
             # Read body safely
             body = b""
             if hasattr(request, "body"):
-                if asyncio.iscoroutine(request.body):
+                if asyncio.iscoroutinefunction(request.body):
                     body = await request.body()
                 else:
                     body = request.body()
@@ -86,7 +127,9 @@ class QSharpDefenseMiddleware:
                 "endpoint": str(request.url.path),
                 "params": dict(request.query_params) if hasattr(request, "query_params") else {},
                 "headers": dict(request.headers),
-                "content": body.decode("utf-8", errors="ignore"),
+                # Decode straight from a view of the scanned prefix, not the whole body
+                "content": str(memoryview(body)[:CONTENT_SCAN_LIMIT], "utf-8", "ignore"),
+                "content_length": len(body),
                 "session_id": request.cookies.get("session_id", ""),
                 "method": request.method
             }
@@ -100,6 +143,7 @@ class QSharpDefenseMiddleware:
                 "params": {},
                 "headers": {},
                 "content": "",
+                "content_length": 0,
                 "session_id": ""
             }
     
@@ -112,21 +156,17 @@ class QSharpDefenseMiddleware:
         2. Return incorrect quantum state measurements
         3. Provide misleading quantum algorithm outputs
         """
-        from starlette.responses import JSONResponse
+        from starlette.responses import Response
         
         threat_category = defense_response.get("threat_category", "unknown")
         tracking_token = self._generate_tracking_token(defense_response)
         
-        # Generate Q# specific fake data
-        fake_data = self._generate_qsharp_fake_data(threat_category, tracking_token)
+        # Splice the token into the Q# specific fake data for this threat
+        template = self._threat_templates.get(threat_category, self._threat_templates["unknown"])
+        body = template.replace(_TOKEN_PLACEHOLDER_JSON, _json_body(tracking_token))
         
         # Return fake response with tracking
-        return JSONResponse({
-            "status": "success",
-            "data": fake_data,
-            "tracking_token": tracking_token,
-            "quantum_enhanced": self.enable_quantum_enhanced
-        })
+        return Response(content=body, media_type="application/json")
     
     def _generate_qsharp_fake_data(self, threat_category: str, 
                                    tracking_token: str) -> Dict[str, Any]:
@@ -185,10 +225,8 @@ class QSharpDefenseMiddleware:
             except:
                 pass
         
-        # Fallback to classical RNG
-        import hashlib
-        data = f"{json.dumps(defense_response)}{time.time()}"
-        return hashlib.sha256(data.encode()).hexdigest()[:16]
+        # Fallback to classical CSPRNG; same 16 hex chars as the old SHA-256 prefix
+        return secrets.token_hex(8)
     
     def _quantum_random_token(self) -> Optional[str]:
         """
@@ -220,11 +258,16 @@ class QSharpDefenseMiddleware:
             "risk_score": defense_response.get("risk_score", 0)
         }
         
-        self.qsharp_operation_history.append(log_entry)
-        
-        # Keep only last 1000 entries
-        if len(self.qsharp_operation_history) > 1000:
-            self.qsharp_operation_history = self.qsharp_operation_history[-1000:]
+        history = self.qsharp_operation_history
+        if len(history) == history.maxlen and history[0]["threat_detected"]:
+            self._threat_count -= 1  # Oldest entry is about to fall off
+        history.append(log_entry)
+        self._threat_count += log_entry["threat_detected"]
+    
+    def recent_qsharp_operations(self, limit: int) -> list:
+        """Most recent logged Q# operations, oldest first"""
+        history = self.qsharp_operation_history
+        return list(islice(history, max(len(history) - limit, 0), None))
     
     def get_qsharp_stats(self) -> Dict[str, Any]:
         """Get statistics about Q# operations and threats"""
@@ -232,7 +275,7 @@ class QSharpDefenseMiddleware:
             return {"total_operations": 0}
         
         total = len(self.qsharp_operation_history)
-        threats = sum(1 for log in self.qsharp_operation_history if log["threat_detected"])
+        threats = self._threat_count
         
         return {
             "total_operations": total,
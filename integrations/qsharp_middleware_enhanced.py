@@ -6,7 +6,7 @@ from fastapi import FastAPI, Request
 from typing import Optional, Dict, Any, Callable
 import json
 import time
-import hashlib
+import secrets
 from pathlib import Path
 import sys
 
@@ -277,8 +277,7 @@ class QuantumDefenseMiddleware:
     
     def _generate_tracking_token(self) -> str:
         """Generate unique tracking token"""
-        token_data = f"{time.time()}{hashlib.urandom(16).hex()}"
-        return hashlib.sha256(token_data.encode()).hexdigest()[:32]
+        return secrets.token_hex(16)
     
     def get_quantum_stats(self) -> Dict[str, Any]:
         """Get quantum defense statistics"""
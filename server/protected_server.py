@@ -691,7 +691,7 @@ async def defense_status(username: str = Depends(verify_credentials)):
 @app.get("/api/defense/threats")
 async def list_threats(username: str = Depends(verify_credentials)):
     """Get recent threat detections"""
-    history = defense.middleware.qsharp_operation_history[-100:]
+    history = defense.middleware.recent_qsharp_operations(100)
     threats = [h for h in history if h["threat_detected"]]
     
     return {